@@ -0,0 +1,20 @@
+from typing import Optional
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.models.recommendation import AlgorithmType
+from app.services.model_readiness import ModelReadiness
+
+router = APIRouter()
+
+@router.get("/health/live")
+async def live():
+    # The process serves requests, models may still be loading
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def ready(algorithm: Optional[AlgorithmType] = None):
+    # 200 once every algorithm (or the one asked for) can serve, 503 before.
+    # The body reports the status of every algorithm and loading step either way
+    stats = ModelReadiness.stats()
+    is_ready = ModelReadiness.is_ready(algorithm) if algorithm is not None else stats['ready']
+    return JSONResponse(status_code=200 if is_ready else 503, content=stats)
@@ -1,10 +1,19 @@
-from typing import Optional
+from typing import Literal, Optional
 from app.services.job_stores import JobStore
+from app.services.model_registry import ModelRegistry
+from app.services.model_readiness import FAILED, READY, ModelReadiness
 from fastapi import APIRouter
-from app.models.recommendation import MovieRequest, RecommendationRequest, JobStatus
-from app.services.recommendation_engine import check_if_in, find_movie, generate_recommendations
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.recommendation import (AlgorithmType, BatchRecommendationRequest, MovieRequest, RecommendationRequest,
+                                       JobStatus)
+from app.services.cost_model import CostModel
+from app.services.result_cache import ResultCache
+from app.services.recommendation_engine import (check_if_in, complete_job, find_movie, generate_recommendations,
+                                                 run_batch, run_recommendations)
 import uuid
+import json
 import logging
+import asyncio
 from asyncio import create_task
 
 logging.basicConfig(level=logging.INFO)
@@ -12,10 +21,36 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# What to do with a request for an algorithm whose models are still loading
+NotReadyPolicy = Literal['queue', 'fail']
+
+
+def failed(status_code: int, error: str, headers: dict = None) -> JSONResponse:
+    return JSONResponse(status_code=status_code, headers=headers,
+                        content=JobStatus(status="failed", error=error).model_dump())
+
+
+def unavailable(algorithm: AlgorithmType, when_not_ready: NotReadyPolicy) -> Optional[JSONResponse]:
+    """
+    503 response when `algorithm` cannot serve the request: its models
+    failed to load, or are loading and the caller asked to fail fast.
+    """
+    status = ModelReadiness.status(algorithm)
+    if status == READY or (status != FAILED and when_not_ready == 'queue'):
+        return None
+    if status == FAILED:
+        return failed(503, ModelReadiness.error(algorithm))
+    return failed(503, f"Models of {algorithm.value} are still loading", headers={"Retry-After": "5"})
+
 @router.post("/recommendations/start")
 async def start_recommendations(
     request: RecommendationRequest,
+    when_not_ready: NotReadyPolicy = 'queue',
 ):
+    response = unavailable(request.algorithm, when_not_ready)
+    if response is not None:
+        return response
+
     job_id = str(uuid.uuid4())
     await JobStore.create_job(job_id)
 
@@ -31,6 +66,64 @@ async def start_recommendations(
     
     return {"jobId": job_id}
 
+@router.post("/recommendations")
+async def recommend(
+    request: RecommendationRequest,
+    deadline_ms: float = 250,
+    when_not_ready: NotReadyPolicy = 'queue',
+):
+    response = unavailable(request.algorithm, when_not_ready)
+    if response is not None:
+        return response
+
+    # Inline when the algorithm is expected to finish within the deadline,
+    # otherwise (or when it overruns, or its models are loading) the client gets a job id to follow.
+    # Until an algorithm ran once its expected time is the cost model's default, 1s for the kNN ones
+    deadline = deadline_ms / 1000
+    if ModelReadiness.is_ready(request.algorithm) and CostModel.fits(request.algorithm, deadline):
+        task = create_task(run_recommendations(request.ratings, request.algorithm, request.params))
+        try:
+            results = await asyncio.wait_for(asyncio.shield(task), deadline)
+            return JobStatus(status="completed", results=results)
+        except asyncio.TimeoutError:
+            job_id = str(uuid.uuid4())
+            await JobStore.create_job(job_id)
+            await JobStore.update_job(job_id, JobStatus(status="running"))
+            logger.info(f"Deadline of {deadline_ms}ms exceeded, continuing as job {job_id}")
+            create_task(complete_job(job_id, task))
+            return {"jobId": job_id}
+        except (KeyError, ValueError) as e:
+            # Ratings or params the algorithm cannot use, such as movies it does not know
+            return failed(422, str(e))
+        except Exception as e:
+            logger.exception(f"{request.algorithm.value} failed")
+            return failed(500, str(e))
+
+    return await start_recommendations(request)
+
+@router.post("/recommendations/batch")
+async def recommend_batch(
+    request: BatchRecommendationRequest,
+    when_not_ready: NotReadyPolicy = 'queue',
+):
+    response = unavailable(request.algorithm, when_not_ready)
+    if response is not None:
+        return response
+    try:
+        await ModelReadiness.wait(request.algorithm)
+    except RuntimeError as e:
+        return failed(503, str(e))
+
+    # Newline-delimited JSON, one line per user in request order as soon as it is scored.
+    # The generator is synchronous, so it runs on the server's thread pool
+    def lines():
+        statuses = run_batch(request.algorithm, [user.ratings for user in request.users], request.params)
+        for user, status in zip(request.users, statuses):
+            yield json.dumps({"userId": user.id, **status.model_dump()}) + "\n"
+
+    logger.info(f"Starting batch of {len(request.users)} users")
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/recommendations/status/{job_id}")
 async def get_job_status(job_id: str):
     print(job_id)
@@ -40,6 +133,18 @@ async def get_job_status(job_id: str):
         return JobStatus(status="failed", error="Job not found")
     return job
 
+@router.get("/recommendations/stream/{job_id}")
+async def stream_job_status(job_id: str):
+    # Server-Sent Events: one message per status change, the last one carries the results
+    async def events():
+        async for job in JobStore.watch(job_id):
+            if job is None:
+                job = JobStatus(status="failed", error="Job not found")
+            yield f"data: {job.model_dump_json()}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @router.post('/movies/check')
 async def is_in_our_db(
     request: MovieRequest,
@@ -66,3 +171,24 @@ async def findMovie(
 
     return results
 
+
+@router.get('/models/stats')
+async def model_stats():
+    # Fit time, fit count and memory of every model owned by the registry
+    return ModelRegistry.stats()
+
+
+@router.get('/recommendations/costs')
+async def recommendation_costs():
+    # Expected duration of every algorithm, used to pick inline or job execution
+    return CostModel.stats()
+
+@router.get('/cache/stats')
+async def cache_stats():
+    # Size and hit/miss counters of the result cache
+    return ResultCache.stats()
+
+@router.get('/jobs/stats')
+async def job_stats():
+    # Live jobs, approximate memory and evictions of the job store
+    return await JobStore.stats()
@@ -1,7 +1,7 @@
 import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import recommendations
+from app.api.endpoints import health, recommendations
 from app.services.recommendation_engine import init_data, init_data
 import os
 
@@ -19,6 +19,8 @@ app.add_middleware(
 
 # Include routers
 app.include_router(recommendations.router, prefix="/api")
+# Liveness and readiness probes stay at the root
+app.include_router(health.router)
 
 if __name__ == "__main__":
     import uvicorn
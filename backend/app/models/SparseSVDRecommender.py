@@ -1,9 +1,24 @@
 import numpy as np
 import joblib
+import json
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from scipy.sparse import csr_matrix
 from sklearn.metrics import mean_squared_error, mean_absolute_error
+from app.models.id_map import IdMap
+
+FOLD_IN_METHODS = ('average', 'regularized')
+SOLVERS = ('sgd', 'minibatch', 'als')
+ARTIFACT_VERSION = 1
+ARTIFACT_ARRAYS = ('user_factors', 'item_factors', 'user_biases', 'item_biases')
+
+
+def transform_rating(predicted_rating, min_rating=0.5, max_rating=5):
+    """Squash raw predictions into the rating range with a sigmoid."""
+    range_width = max_rating - min_rating
+    return min_rating + range_width / (1 + np.exp(-predicted_rating))
+
 
 class SparseSVDRecommender:
     def __init__(self, n_factors: int = 100, learning_rate: float = 0.005,
@@ -22,6 +37,8 @@ class SparseSVDRecommender:
         self.user_biases = None
         self.item_biases = None
         self.global_mean = None
+        self.solver = None
+        self.training_history = []
 
         # Mapping dictionaries
         self.user_id_map = {}
@@ -32,7 +49,10 @@ class SparseSVDRecommender:
 
     def fit(self, ratings_matrix_train: csr_matrix, 
             user_id_map: dict = None, 
-            movie_id_map: dict = None) -> 'SparseSVDRecommender3':
+            movie_id_map: dict = None,
+            solver: str = 'sgd',
+            batch_size: int = 4096,
+            n_jobs: int = None) -> 'SparseSVDRecommender':
         """
         Train the model using a pre-computed sparse ratings matrix.
         
@@ -40,7 +60,18 @@ class SparseSVDRecommender:
             ratings_matrix_train (csr_matrix): Sparse training ratings matrix
             user_id_map (dict, optional): Mapping of original user IDs to matrix indices
             movie_id_map (dict, optional): Mapping of original movie IDs to matrix indices
+            solver (str): 'sgd' updates the parameters after every rating, in Python.
+                'minibatch' runs the same updates on shuffled batches of ratings with
+                numpy, every rating of a batch seeing the parameters of the batch start.
+                'als' alternates exact ridge solves of the user side and the item side
+                (see _als_solve), it needs far fewer epochs than SGD
+            batch_size (int): Ratings per update of the 'minibatch' solver
+            n_jobs (int, optional): Threads of the 'als' solver, defaults to the CPU count
+
+        The RMSE and time of every epoch are kept in `training_history`.
         """
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
         print("\n--- Starting SVD Training ---")
         start_total_time = time.time()
 
@@ -53,11 +84,10 @@ class SparseSVDRecommender:
             self.reverse_user_id_map = {idx: user for user, idx in user_id_map.items()}
 
         if movie_id_map is None:
-            self.movie_id_map = {i: i for i in range(ratings_matrix_train.shape[1])}
+            self.movie_id_map = IdMap.identity(ratings_matrix_train.shape[1])
             self.reverse_movie_id_map = self.movie_id_map
         else:
-            self.movie_id_map = movie_id_map
-            self.reverse_movie_id_map = {idx: movie for movie, idx in movie_id_map.items()}
+            self._set_movie_id_map(movie_id_map)
 
             # Compute global mean
         self.global_mean = ratings_matrix_train.data.mean()
@@ -70,51 +100,46 @@ class SparseSVDRecommender:
         # Initialize matrices
         self._init_matrices(n_users, n_items)
 
-        # Get indices of non-zero elements
-        users, items = ratings_matrix_train.nonzero()
+        # Ratings as COO arrays, in the order of ratings_matrix_train.nonzero()
+        coo = ratings_matrix_train.tocsr().tocoo()
+        stored = coo.data != 0
+        users, items, ratings = coo.row[stored], coo.col[stored], coo.data[stored].astype(np.float64)
         total_ratings = len(users)
         print(f"Total ratings to train on: {total_ratings}")
 
-            # Training loop
-        for epoch in range(self.n_epochs):
-            epoch_start_time = time.time()
-
-            # Shuffle the order of training examples
-            shuffle_indices = np.random.permutation(len(users))
-
-            # Track total error for the epoch
-            total_error = 0
+        self.solver = solver
+        self.training_history = []
+        if solver == 'als':
+            user_matrix = csr_matrix((ratings, (users, items)), shape=(n_users, n_items))
+            item_matrix = user_matrix.T.tocsr()
+        executor = ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) if solver == 'als' else None
 
-            for idx in shuffle_indices:
-                u, i = users[idx], items[idx]
-                r = ratings_matrix_train[u, i]
-
-                # Compute current prediction
-                pred = (self.global_mean +
-                        self.user_biases[u] +
-                        self.item_biases[i] +
-                        self.user_factors[u] @ self.item_factors[i])
-
-                # Compute error
-                error = r - pred
-                total_error += error ** 2
-
-                # Update biases and factors
-                self.user_biases[u] += self.learning_rate * (error - self.regularization * self.user_biases[u])
-                self.item_biases[i] += self.learning_rate * (error - self.regularization * self.item_biases[i])
-
-                user_factors_update = (error * self.item_factors[i] -
-                                       self.regularization * self.user_factors[u])
-                item_factors_update = (error * self.user_factors[u] -
-                                       self.regularization * self.item_factors[i])
-
-                self.user_factors[u] += self.learning_rate * user_factors_update
-                self.item_factors[i] += self.learning_rate * item_factors_update
-
-            # Print epoch summary
-            rmse = np.sqrt(total_error / total_ratings)
-            epoch_time = time.time() - epoch_start_time
-            print(f"Epoch {epoch + 1}/{self.n_epochs}: RMSE = {rmse:.4f}, Time = {epoch_time:.2f}s")
+        try:
+            # Training loop
+            for epoch in range(self.n_epochs):
+                epoch_start_time = time.time()
+
+                if solver == 'als':
+                    # Error of the parameters at the end of the epoch
+                    self._als_epoch(user_matrix, item_matrix, executor)
+                    errors = ratings - self.predict_batch(users, items)
+                    total_error = float(errors @ errors)
+                else:
+                    # Shuffle the order of training examples
+                    shuffle_indices = np.random.permutation(len(users))
+
+                    # Track total error for the epoch
+                    run_epoch = self._sgd_epoch if solver == 'sgd' else self._minibatch_epoch
+                    total_error = run_epoch(users, items, ratings, shuffle_indices, batch_size)
+
+                # Print epoch summary
+                rmse = np.sqrt(total_error / total_ratings)
+                epoch_time = time.time() - epoch_start_time
+                self.training_history.append({'epoch': epoch + 1, 'rmse': float(rmse), 'seconds': epoch_time})
+                print(f"Epoch {epoch + 1}/{self.n_epochs}: RMSE = {rmse:.4f}, Time = {epoch_time:.2f}s")
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
         # Final training summary
         total_training_time = time.time() - start_total_time
@@ -123,43 +148,165 @@ class SparseSVDRecommender:
 
         return self
 
+    def _sgd_epoch(self, users, items, ratings, shuffle_indices, batch_size=None) -> float:
+        """One pass of per-rating SGD, returns the summed squared error before each update."""
+        total_error = 0
+        for idx in shuffle_indices:
+            u, i = users[idx], items[idx]
+            r = ratings[idx]
+
+            # Compute current prediction
+            pred = (self.global_mean +
+                    self.user_biases[u] +
+                    self.item_biases[i] +
+                    self.user_factors[u] @ self.item_factors[i])
+
+            # Compute error
+            error = r - pred
+            total_error += error ** 2
+
+            # Update biases and factors
+            self.user_biases[u] += self.learning_rate * (error - self.regularization * self.user_biases[u])
+            self.item_biases[i] += self.learning_rate * (error - self.regularization * self.item_biases[i])
+
+            user_factors_update = (error * self.item_factors[i] -
+                                   self.regularization * self.user_factors[u])
+            item_factors_update = (error * self.user_factors[u] -
+                                   self.regularization * self.item_factors[i])
+
+            self.user_factors[u] += self.learning_rate * user_factors_update
+            self.item_factors[i] += self.learning_rate * item_factors_update
+        return total_error
+
+    def _minibatch_epoch(self, users, items, ratings, shuffle_indices, batch_size=4096) -> float:
+        """
+        One pass of the SGD updates applied per shuffled batch: the errors of
+        a batch are computed together and every rating's update is added with
+        np.add.at (biases with bincount), so ratings of the same user or item
+        in a batch all count.
+        """
+        n_users, n_items = len(self.user_biases), len(self.item_biases)
+        lr, reg = self.learning_rate, self.regularization
+        total_error = 0.0
+        for start in range(0, len(shuffle_indices), batch_size):
+            batch = shuffle_indices[start:start + batch_size]
+            u, i = users[batch], items[batch]
+            user_rows, item_rows = self.user_factors[u], self.item_factors[i]
+
+            errors = ratings[batch] - self.predict_batch(u, i)
+            total_error += float(errors @ errors)
+
+            self.user_biases += lr * np.bincount(u, weights=errors - reg * self.user_biases[u], minlength=n_users)
+            self.item_biases += lr * np.bincount(i, weights=errors - reg * self.item_biases[i], minlength=n_items)
+
+            np.add.at(self.user_factors, u, lr * (errors[:, None] * item_rows - reg * user_rows))
+            np.add.at(self.item_factors, i, lr * (errors[:, None] * user_rows - reg * item_rows))
+        return total_error
+
+    def _als_epoch(self, user_matrix: csr_matrix, item_matrix: csr_matrix, executor: ThreadPoolExecutor,
+                   block_size: int = 256):
+        """One ALS pass: every user with the items fixed, then every item with the users fixed."""
+        self.user_factors, self.user_biases = self._als_solve(
+            user_matrix, self.item_factors, self.item_biases, executor, block_size)
+        self.item_factors, self.item_biases = self._als_solve(
+            item_matrix, self.user_factors, self.user_biases, executor, block_size)
+
+    def _als_solve(self, matrix: csr_matrix, fixed_factors: np.ndarray, fixed_biases: np.ndarray,
+                   executor: ThreadPoolExecutor = None, block_size: int = 256, regularization: float = None):
+        """
+        Factors and biases of every row of `matrix` with the other side fixed:
+        for row u, with x_i = [fixed_factors[i], 1] over its rated columns i,
+            min sum_i (r_ui - mu - fixed_biases[i] - x_i @ [p_u, b_u])^2 + l2 * ||[p_u, b_u]||^2
+        where l2 = regularization * number of ratings of u, the penalty SGD
+        applies once per rating. Blocks of rows are solved on the thread pool
+        (in the calling thread without one) with one batched np.linalg.solve
+        each; the Gram products and the solve run in BLAS/LAPACK outside the
+        GIL. Rows without ratings get zeros.
+        """
+        if regularization is None:
+            regularization = self.regularization
+        n_rows, n_factors = matrix.shape[0], fixed_factors.shape[1]
+        design = np.hstack([fixed_factors, np.ones((len(fixed_factors), 1))])
+        targets = matrix.data - self.global_mean - fixed_biases[matrix.indices]
+        counts = np.diff(matrix.indptr)
+        factors = np.zeros((n_rows, n_factors))
+        biases = np.zeros(n_rows)
+
+        def solve_block(start):
+            rows = np.flatnonzero(counts[start:start + block_size]) + start
+            if len(rows) == 0:
+                return
+            gram = np.empty((len(rows), n_factors + 1, n_factors + 1))
+            rhs = np.empty((len(rows), n_factors + 1))
+            for position, row in enumerate(rows):
+                ratings = slice(matrix.indptr[row], matrix.indptr[row + 1])
+                x = design[matrix.indices[ratings]]
+                gram[position] = x.T @ x
+                rhs[position] = targets[ratings] @ x
+            diagonal = np.arange(n_factors + 1)
+            gram[:, diagonal, diagonal] += (regularization * counts[rows])[:, None]
+
+            solution = np.linalg.solve(gram, rhs[..., None])[..., 0]
+            factors[rows] = solution[:, :-1]
+            biases[rows] = solution[:, -1]
+
+        if executor is None:
+            for start in range(0, n_rows, block_size):
+                solve_block(start)
+        else:
+            list(executor.map(solve_block, range(0, n_rows, block_size)))
+        return factors, biases
+
+    def predict_batch(self, users: np.ndarray, items: np.ndarray) -> np.ndarray:
+        """
+        Predictions for arrays of (user, item) matrix indices: one gather of
+        the factor rows and a row-wise dot product. Pairs with an index
+        outside the model get the global mean, as predict does for unknown ids.
+        """
+        users, items = np.asarray(users, dtype=np.int64), np.asarray(items, dtype=np.int64)
+        known = (users >= 0) & (users < len(self.user_biases)) & (items >= 0) & (items < len(self.item_biases))
+        if known.all():
+            return (self.global_mean + self.user_biases[users] + self.item_biases[items] +
+                    np.einsum('ij,ij->i', self.user_factors[users], self.item_factors[items]))
+
+        predictions = np.full(len(users), self.global_mean, dtype=np.float64)
+        predictions[known] = self.predict_batch(users[known], items[known])
+        return predictions
+
     def evaluate(self, ratings_matrix_test: csr_matrix, 
-         include_unrated: bool = False):
+         include_unrated: bool = False, chunk_size: int = 1_000_000):
         """
         Evaluate model performance on test sparse matrix.
         
         Args:
-            ratings_matrix_test (csr_matrix): Sparse test ratings matrix
+            ratings_matrix_test (csr_matrix): Sparse test ratings matrix, indexed like the training matrix
             include_unrated (bool): Whether to include predictions for unrated items
+            chunk_size (int): Approximate number of test ratings predicted at once, which bounds
+                the memory of the gathered factor rows
 
         Returns:
             Dict with performance metrics, actual ratings, and predictions
         """
         print("\n--- Model Evaluation ---")
-        
-        # Compute predictions for test set
+
+        # Blocks of whole rows holding about chunk_size ratings each
+        ratings_matrix_test = ratings_matrix_test.tocsr()
+        indptr = ratings_matrix_test.indptr
+        boundaries = np.unique(np.concatenate([
+            np.searchsorted(indptr, np.arange(0, indptr[-1], max(chunk_size, 1)), side='right') - 1,
+            [ratings_matrix_test.shape[0]]]))
+
         predictions = []
         actual_ratings = []
-        
-        # Get test set non-zero indices
-        test_users, test_items = ratings_matrix_test.nonzero()
-        
-        for idx in range(len(test_users)):
-            u, i = test_users[idx], test_items[idx]
-            actual_rating = ratings_matrix_test[u, i]
-            
-            # Translate back to original IDs if needed
-            orig_user_id = self.reverse_user_id_map.get(u, u)
-            orig_movie_id = self.reverse_movie_id_map.get(i, i)
-            
-            try:
-                pred = self.predict(orig_user_id, orig_movie_id)
-                predictions.append(pred)
-                actual_ratings.append(actual_rating)
-            except Exception as e:
-                print(f"Prediction error for user {u}, movie {i}: {e}")
-                continue
-        
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            block = ratings_matrix_test[start:end].tocoo()
+            stored = block.data != 0
+            actual_ratings.append(block.data[stored].astype(np.float64))
+            predictions.append(self.predict_batch(block.row[stored] + start, block.col[stored]))
+
+        actual_ratings = np.concatenate(actual_ratings) if actual_ratings else np.empty(0)
+        predictions = np.concatenate(predictions) if predictions else np.empty(0)
+
         # Compute metrics
         rmse = np.sqrt(mean_squared_error(actual_ratings, predictions))
         mae = mean_absolute_error(actual_ratings, predictions)
@@ -187,12 +334,15 @@ class SparseSVDRecommender:
                 'user_biases': self.user_biases,
                 'item_biases': self.item_biases,
                 'global_mean': self.global_mean,
-                'user_id_map': self.user_id_map,
-                'movie_id_map': self.movie_id_map,
+                # Plain dicts, also when loaded from an artifact as IdMaps, so older code can read the file
+                'user_id_map': dict(self.user_id_map),
+                'movie_id_map': dict(self.movie_id_map),
                 'n_factors': self.n_factors,
                 'learning_rate': self.learning_rate,
                 'regularization': self.regularization,
-                'n_epochs': self.n_epochs
+                'n_epochs': self.n_epochs,
+                'solver': self.solver,
+                'training_history': self.training_history
             }
 
             joblib.dump(model_state, filepath)
@@ -201,12 +351,99 @@ class SparseSVDRecommender:
         except Exception as e:
             print(f"Error saving model: {e}")
 
-    def load_model(self, filepath: str = 'svd_recommender_model.joblib'):
-        """Load a previously saved model state."""
+    def save_artifact(self, dirpath: str = './Data/svd_model', dtype: str = 'float64'):
+        """
+        Write the model as an artifact directory that load_model opens memory-mapped.
+
+        Args:
+            dirpath (str): Directory holding manifest.json, one .npy file per factor
+                and bias array, and the id maps as sorted key/value int64 arrays
+            dtype (str): Float type of the stored arrays, 'float32' halves the size
+        """
+        if self.user_factors is None:
+            raise ValueError("Model must be trained before saving")
+        os.makedirs(dirpath, exist_ok=True)
+
+        for name in ARTIFACT_ARRAYS:
+            np.save(os.path.join(dirpath, f'{name}.npy'), np.asarray(getattr(self, name), dtype=dtype))
+        IdMap.from_dict(self.user_id_map).save(os.path.join(dirpath, 'user_ids.npy'),
+                                               os.path.join(dirpath, 'user_indices.npy'))
+        IdMap.from_dict(self.movie_id_map).save(os.path.join(dirpath, 'movie_ids.npy'),
+                                                os.path.join(dirpath, 'movie_indices.npy'))
+
+        # Written last: a directory without a manifest is not a model
+        manifest = {
+            'version': ARTIFACT_VERSION,
+            'dtype': dtype,
+            'n_users': int(self.user_factors.shape[0]),
+            'n_items': int(self.item_factors.shape[0]),
+            'n_factors': int(self.item_factors.shape[1]),
+            'global_mean': float(self.global_mean),
+            'hyperparameters': {
+                'n_factors': self.n_factors,
+                'learning_rate': self.learning_rate,
+                'regularization': self.regularization,
+                'n_epochs': self.n_epochs,
+            },
+            'solver': self.solver,
+            'training_history': self.training_history,
+        }
+        with open(os.path.join(dirpath, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Model artifact saved to {dirpath}")
+
+    def _load_artifact(self, dirpath: str, mmap_mode: str = 'r') -> dict:
+        """Open an artifact directory written by save_artifact, returns its manifest."""
+        with open(os.path.join(dirpath, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['version'] > ARTIFACT_VERSION:
+            raise ValueError(f"Model artifact version {manifest['version']} is newer than the supported "
+                             f"version {ARTIFACT_VERSION}")
+
+        for name in ARTIFACT_ARRAYS:
+            setattr(self, name, np.load(os.path.join(dirpath, f'{name}.npy'), mmap_mode=mmap_mode))
+        if self.user_factors.shape != (manifest['n_users'], manifest['n_factors']) or \
+                self.item_factors.shape != (manifest['n_items'], manifest['n_factors']):
+            raise ValueError(f"Factor shapes {self.user_factors.shape}, {self.item_factors.shape} "
+                             f"do not match the manifest of {dirpath}")
+        self.global_mean = manifest['global_mean']
+
+        hyperparameters = manifest['hyperparameters']
+        self.n_factors = hyperparameters['n_factors']
+        self.learning_rate = hyperparameters['learning_rate']
+        self.regularization = hyperparameters['regularization']
+        self.n_epochs = hyperparameters['n_epochs']
+        self.solver = manifest.get('solver')
+        self.training_history = manifest.get('training_history', [])
+
+        # Sorted id arrays, the reverse directions are two arrays swapped
+        self.user_id_map = IdMap.load(os.path.join(dirpath, 'user_ids.npy'),
+                                      os.path.join(dirpath, 'user_indices.npy'), mmap_mode=mmap_mode)
+        self.movie_id_map = IdMap.load(os.path.join(dirpath, 'movie_ids.npy'),
+                                       os.path.join(dirpath, 'movie_indices.npy'), mmap_mode=mmap_mode)
+        self.reverse_user_id_map = self.user_id_map.reverse()
+        self.reverse_movie_id_map = self.movie_id_map.reverse()
+        return manifest
+
+    def load_model(self, filepath: str = 'svd_recommender_model.joblib', mmap_mode: str = 'r'):
+        """
+        Load a previously saved model state: an artifact directory written by
+        save_artifact (arrays memory-mapped with `mmap_mode`, None to read them
+        into memory) or a joblib file written by save_model.
+        """
         try:
             if not os.path.exists(filepath):
                 raise FileNotFoundError(f"No model file found at {filepath}")
 
+            if os.path.isdir(filepath):
+                manifest = self._load_artifact(filepath, mmap_mode)
+                print(f"Model successfully loaded from {filepath} (artifact version {manifest['version']})")
+                print(f"Loaded model details:")
+                print(f"  - Latent Factors: {manifest['n_factors']}")
+                print(f"  - Unique Users: {len(self.user_id_map)}")
+                print(f"  - Unique Movies: {len(self.movie_id_map)}")
+                return self
+
             model_state = joblib.load(filepath)
 
             # Restore model parameters
@@ -215,14 +452,20 @@ class SparseSVDRecommender:
             self.user_biases = model_state['user_biases']
             self.item_biases = model_state['item_biases']
             self.global_mean = model_state['global_mean']
+            self.n_factors = model_state.get('n_factors', self.n_factors)
+            self.learning_rate = model_state.get('learning_rate', self.learning_rate)
+            self.regularization = model_state.get('regularization', self.regularization)
+            self.n_epochs = model_state.get('n_epochs', self.n_epochs)
+            # Absent from models saved before trainer modes existed
+            self.solver = model_state.get('solver')
+            self.training_history = model_state.get('training_history', [])
 
             # Restore mapping dictionaries
             self.user_id_map = model_state['user_id_map']
-            self.movie_id_map = model_state['movie_id_map']
+            self._set_movie_id_map(model_state['movie_id_map'])
 
             # Recreate reverse mapping dictionaries
             self.reverse_user_id_map = {idx: user for user, idx in self.user_id_map.items()}
-            self.reverse_movie_id_map = {idx: movie for movie, idx in self.movie_id_map.items()}
 
             print(f"Model successfully loaded from {filepath}")
             print(f"Loaded model details:")
@@ -244,6 +487,21 @@ class SparseSVDRecommender:
         self.user_biases = np.zeros(n_users)
         self.item_biases = np.zeros(n_items)
 
+    def _set_movie_id_map(self, movie_id_map):
+        """Keep integer movie ids as an IdMap, so batches of them are looked up with searchsorted."""
+        try:
+            self.movie_id_map = IdMap.from_dict(movie_id_map)
+            self.reverse_movie_id_map = self.movie_id_map.reverse()
+        except ValueError:
+            self.movie_id_map = movie_id_map
+            self.reverse_movie_id_map = {idx: movie for movie, idx in movie_id_map.items()}
+
+    def item_indices(self, movie_ids) -> np.ndarray:
+        """Item index of every movie id, -1 for movies absent from the training data."""
+        if isinstance(self.movie_id_map, IdMap):
+            return self.movie_id_map.lookup(movie_ids)
+        return np.array([self.movie_id_map.get(movie_id, -1) for movie_id in movie_ids], dtype=np.int64)
+
     def predict(self, user_id: int, movie_id: int) -> float:
         """Predict rating with error handling and logging."""
         if self.user_factors is None:
@@ -297,84 +555,141 @@ class SparseSVDRecommender:
 
         return predictions
 
-    def handle_new_user(self, user_ratings, n_items=10):
+    def handle_new_user(self, movie_ids, ratings, n_items: int = 10, method: str = 'average',
+                        regularization: float = None):
         """
         Incorporate new user ratings into recommendations without full retraining
 
         Args:
-            user_ratings (pd.DataFrame): DataFrame with columns 'movieId' and 'rating'
+            movie_ids (array-like): Sparse movie ids of the rated movies, ids unknown to the model are ignored
+            ratings (array-like): Rating of every movie in movie_ids
             n_items (int): Number of recommendations to return
+            method (str): How the user is folded in, see fold_in
+            regularization (float): L2 penalty of the 'regularized' method
 
         Returns:
-            List of recommended movie IDs
+            List of (movie_id, score) tuples, best first, rated movies excluded
         """
         # Check if model is trained
         if self.user_factors is None:
             raise ValueError("Model must be trained first")
 
         # Validate movie IDs exist in original training data
-        valid_movies = [mid for mid in user_ratings['sparse_movie_id'] if mid in self.movie_id_map]
-        valid_ratings = user_ratings[user_ratings['sparse_movie_id'].isin(valid_movies)]
-
-        if len(valid_movies) == 0:
+        items = self.item_indices(movie_ids)
+        valid = items >= 0
+        if not valid.any():
             print("No valid movie ratings found")
             return []
+        items = items[valid]
+        ratings = np.asarray(ratings, dtype=np.float64)[valid]
+
+        user_factors, user_biases = self.fold_in(np.zeros(len(items), dtype=np.int64), items, ratings, 1,
+                                                 method=method, regularization=regularization)
+        predictions = self._predict_folded(user_factors, user_biases, method)
+        predictions[0, items] = -np.inf
+
+        top, top_predictions = self._top_n(predictions, n_items)
+        keep = np.isfinite(top_predictions[0])
+        # Rank on the raw predictions, report them clipped and squashed to the rating range
+        scores = transform_rating(np.clip(top_predictions[0][keep], None, 5), 0.5, 5)
+        return [(self.reverse_movie_id_map[idx], score) for idx, score in zip(top[0][keep], scores)]
+
+    def fold_in(self, users: np.ndarray, items: np.ndarray, ratings: np.ndarray, n_users: int,
+                method: str = 'average', regularization: float = None):
+        """
+        Factors and biases of new users from their ratings, without retraining.
 
-        # Ensure consistent dimensionality
-        new_user_factors = np.zeros(self.item_factors.shape[1])
-        new_user_bias = 0
-
-        for _, row in valid_ratings.iterrows():
-            movie_idx = self.movie_id_map[row['sparse_movie_id']]
-
-            # Safely handle potential shape mismatches
-            movie_factors = self.item_factors[movie_idx]
-
-            # Ensure correct dimensionality
-            if len(movie_factors) != len(new_user_factors):
-                # Truncate or pad the movie factors to match new_user_factors
-                if len(movie_factors) > len(new_user_factors):
-                    movie_factors = movie_factors[:len(new_user_factors)]
-                else:
-                    padded_factors = np.zeros(len(new_user_factors))
-                    padded_factors[:len(movie_factors)] = movie_factors
-                    movie_factors = padded_factors
-
-            # Update user vector with weighted item factors
-            new_user_factors += row['rating'] * movie_factors
-            new_user_bias += row['rating'] - self.global_mean
-
-        # Normalize by number of ratings
-        new_user_factors /= len(valid_ratings)
-        new_user_bias /= len(valid_ratings)
-
-        # Compute predictions for all items
-        predictions = (self.global_mean +
-                       new_user_bias +
-                       new_user_factors @ self.item_factors.T)
-
-        predictions = np.clip(predictions, None, 5)
+        'average' takes the rating-weighted mean of the rated items' factors
+        and the mean offset from the global mean. 'regularized' solves, per
+        user, the ridge problem the training objective poses for a single
+        user with the item side fixed:
+            min ||r - mu - b_i - [q_i, 1] @ [p, b_u]||^2 + l2 * ||[p, b_u]||^2
+        with l2 = regularization * number of ratings, as SGD applies the
+        penalty once per rating.
 
-        def normalize_rating(predicted_rating, min_pred, max_pred, min_rating, max_rating):
-            return min_rating + (predicted_rating - min_pred) * (max_rating - min_rating) / (max_pred - min_pred)
+        Args:
+            users (np.ndarray): Row of the user of every rating, in [0, n_users)
+            items (np.ndarray): Model item index of every rating
+            ratings (np.ndarray): Rating values
+            n_users (int): Number of users in the batch
+            method (str): 'average' or 'regularized'
+            regularization (float): Penalty per rating, defaults to the training regularization
 
-        def transform_rating(predicted_rating, min_rating, max_rating):
-            range_width = max_rating - min_rating
-            return min_rating + range_width / (1 + np.exp(-predicted_rating))
+        Returns:
+            (user_factors, user_biases) of shapes (n_users, n_factors) and (n_users,),
+            zeros for users without ratings
+        """
+        if method not in FOLD_IN_METHODS:
+            raise ValueError(f"Unknown fold-in method '{method}', expected one of {FOLD_IN_METHODS}")
+        counts = np.bincount(users, minlength=n_users)
+
+        if method == 'average':
+            matrix = csr_matrix((ratings, (users, items)), shape=(n_users, self.item_factors.shape[0]))
+            safe_counts = np.maximum(counts, 1)
+            user_factors = (matrix @ self.item_factors) / safe_counts[:, None]
+            user_biases = (np.asarray(matrix.sum(axis=1)).ravel() - counts * self.global_mean) / safe_counts
+            return user_factors, user_biases
+
+        # Rows sliced by user without summing duplicated ratings, as one-user ALS problems
+        order = np.argsort(users, kind='stable')
+        matrix = csr_matrix((ratings[order], items[order], np.concatenate([[0], np.cumsum(counts)])),
+                            shape=(n_users, self.item_factors.shape[0]))
+        return self._als_solve(matrix, self.item_factors, self.item_biases, regularization=regularization)
+
+    def _predict_folded(self, user_factors: np.ndarray, user_biases: np.ndarray, method: str) -> np.ndarray:
+        """Raw predictions of folded-in users for every item."""
+        predictions = self.global_mean + user_biases[:, None] + user_factors @ self.item_factors.T
+        if method == 'regularized':
+            # The regularized fold-in is fitted with the item biases, the average one never used them
+            predictions += self.item_biases
+        return predictions
 
-        #print("normalizing")
-        predictions = transform_rating(predictions, 0.5, 5)  
-        #predictions = normalize_rating(predictions, np.min(predictions), np.max(predictions), 0.5, 5)
+    @staticmethod
+    def _top_n(predictions: np.ndarray, n: int):
+        """
+        Column indices and values of the n largest predictions of every row,
+        best first, ties broken by index as a stable sort of the full row would.
+        """
+        n = min(n, predictions.shape[1])
+        top = np.sort(np.argpartition(-predictions, n - 1, axis=1)[:, :n], axis=1)
+        top_predictions = np.take_along_axis(predictions, top, axis=1)
+        order = np.argsort(-top_predictions, axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_predictions, order, axis=1)
+
+    def recommend_batch(self, users: np.ndarray, items: np.ndarray, ratings: np.ndarray, n_users: int,
+                        n_items: int = 10, chunk_size: int = 256, method: str = 'average'):
+        """
+        Recommendations for many new users at once: all users are folded in
+        together and scored with one matrix product per chunk of users.
 
-        # Create and sort recommendations
-        recommendations = [
-            (self.reverse_movie_id_map[idx], pred)
-            for idx, pred in enumerate(predictions)
-        ]
-        recommendations.sort(key=lambda x: x[1], reverse=True)
+        Args are those of fold_in, plus n_items per user and the number of
+        users scored per product (the score block is chunk_size x n_movies).
 
-        # Exclude movies already rated
-        rated_movies = set(valid_ratings['sparse_movie_id'])
-        recommendations = [rec for rec in recommendations if rec[0] not in rated_movies]
+        Yields:
+            For every user in order, a list of (movie_id, score) tuples as
+            returned by handle_new_user; empty for users without ratings
+        """
+        if self.user_factors is None:
+            raise ValueError("Model must be trained first")
 
-        return recommendations
\ No newline at end of file
+        user_factors, user_biases = self.fold_in(users, items, ratings, n_users, method=method)
+        counts = np.bincount(users, minlength=n_users)
+        rated = csr_matrix((np.ones(len(users), dtype=bool), (users, items)),
+                           shape=(n_users, self.item_factors.shape[0]))
+
+        for start in range(0, n_users, chunk_size):
+            end = min(start + chunk_size, n_users)
+            predictions = self._predict_folded(user_factors[start:end], user_biases[start:end], method)
+            block = rated[start:end].tocoo()
+            predictions[block.row, block.col] = -np.inf
+
+            top, top_predictions = self._top_n(predictions, n_items)
+            top_scores = transform_rating(np.clip(top_predictions, None, 5), 0.5, 5)
+
+            for row in range(end - start):
+                if counts[start + row] == 0:
+                    yield []
+                    continue
+                keep = np.isfinite(top_predictions[row])
+                yield [(self.reverse_movie_id_map[idx], score)
+                       for idx, score in zip(top[row][keep], top_scores[row][keep])]
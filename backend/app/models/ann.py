@@ -0,0 +1,132 @@
+import time
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+
+
+def normalize_rows(X) -> csr_matrix:
+    """L2-normalize the rows of a sparse matrix, empty rows are left at zero."""
+    X = csr_matrix(X, dtype=np.float32)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return diags(1 / norms).dot(X).tocsr()
+
+
+class RandomProjectionLSH:
+    """
+    Approximate cosine nearest-neighbor index over the rows of a sparse matrix.
+
+    Every row is L2-normalized and hashed in `n_tables` independent tables by
+    the signs of `n_bits` random projections. A query collects the rows that
+    share its bucket in any table (plus the buckets one bit away when
+    `probe_hamming` is set) and reranks them by exact cosine similarity. It
+    exposes the same `fit`/`kneighbors` interface as sklearn's
+    NearestNeighbors(metric='cosine') so the recommenders can use either.
+    """
+
+    def __init__(self, n_tables: int = 8, n_bits: int = 12, probe_hamming: bool = True,
+                 random_state: int = 42):
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.probe_hamming = probe_hamming
+        self.random_state = random_state
+
+        self.projections = None
+        self.sorted_codes = None
+        self.order = None
+        self.data = None
+
+    def _hash(self, X) -> np.ndarray:
+        """Bucket codes of the rows of X, shape (n_tables, n_rows)."""
+        powers = (1 << np.arange(self.n_bits)).astype(np.int64)
+        return np.stack([((X @ projection) > 0).astype(np.int64) @ powers for projection in self.projections])
+
+    def _index(self, codes):
+        self.order = np.argsort(codes, axis=1, kind='stable').astype(np.int32)
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=1)
+
+    def fit(self, X) -> 'RandomProjectionLSH':
+        """Hash every row of X (rows x features sparse matrix)."""
+        print(f"\n--- Building LSH index ({self.n_tables} tables x {self.n_bits} bits) ---")
+        start = time.time()
+        rng = np.random.default_rng(self.random_state)
+        self.data = normalize_rows(X)
+        self.projections = rng.standard_normal((self.n_tables, self.data.shape[1], self.n_bits)).astype(np.float32)
+        self._index(self._hash(self.data))
+        print(f"LSH index over {self.data.shape[0]} rows built in {time.time() - start:.2f}s")
+        return self
+
+    def save(self, filepath: str = './Data/user_lsh.npz'):
+        """Save projections and bucket tables; the indexed matrix itself is not duplicated."""
+        np.savez(filepath, projections=self.projections, sorted_codes=self.sorted_codes, order=self.order,
+                 params=np.array([self.n_tables, self.n_bits, int(self.probe_hamming), self.random_state]))
+        print(f"LSH index saved to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str, X) -> 'RandomProjectionLSH':
+        """
+        Load an index written with `save` and attach the matrix it was built on.
+
+        Raises:
+            ValueError: If X does not have the shape the index was built for
+        """
+        with np.load(filepath) as artifact:
+            n_tables, n_bits, probe_hamming, random_state = artifact['params'].tolist()
+            index = cls(n_tables, n_bits, bool(probe_hamming), random_state)
+            index.projections = artifact['projections']
+            index.sorted_codes = artifact['sorted_codes']
+            index.order = artifact['order']
+
+        if index.projections.shape[1] != X.shape[1] or index.order.shape[1] != X.shape[0]:
+            raise ValueError(f"LSH index at {filepath} does not match a matrix of shape {X.shape}")
+        index.data = normalize_rows(X)
+        return index
+
+    def candidates(self, query_codes: np.ndarray) -> np.ndarray:
+        """Rows sharing a probed bucket with a query, given its codes in every table."""
+        probes = query_codes[:, None]
+        if self.probe_hamming:
+            flips = (1 << np.arange(self.n_bits)).astype(np.int64)
+            probes = np.concatenate([probes, query_codes[:, None] ^ flips[None, :]], axis=1)
+
+        found = []
+        for table in range(self.n_tables):
+            low = np.searchsorted(self.sorted_codes[table], probes[table], side='left')
+            high = np.searchsorted(self.sorted_codes[table], probes[table], side='right')
+            found.extend(self.order[table, l:h] for l, h in zip(low, high) if h > l)
+
+        if not found:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(found))
+
+    def kneighbors(self, X, n_neighbors: int = 20, return_distance: bool = True):
+        """
+        Approximate cosine neighbors of every row of X, closest first.
+
+        Falls back to an exact scan for a query whose buckets hold fewer
+        than n_neighbors rows.
+
+        Returns:
+            (distances, indices) arrays of shape (n_queries, n_neighbors), with
+            distance = 1 - cosine similarity, or only indices when
+            return_distance is False
+        """
+        queries = normalize_rows(X)
+        codes = self._hash(queries)
+        n_neighbors = min(n_neighbors, self.data.shape[0])
+
+        distances = np.empty((queries.shape[0], n_neighbors))
+        indices = np.empty((queries.shape[0], n_neighbors), dtype=np.int64)
+        for q in range(queries.shape[0]):
+            rows = self.candidates(codes[:, q])
+            if len(rows) < n_neighbors:
+                rows = np.arange(self.data.shape[0])
+
+            sims = np.asarray((self.data[rows] @ queries[q].T).todense()).ravel()
+            top = np.argpartition(-sims, n_neighbors - 1)[:n_neighbors]
+            top = top[np.argsort(-sims[top], kind='stable')]
+            indices[q] = rows[top]
+            distances[q] = 1 - sims[top]
+
+        if return_distance:
+            return distances, indices
+        return indices
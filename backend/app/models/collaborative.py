@@ -1,4 +1,3 @@
-import asyncio
 import time
 import joblib
 import os
@@ -11,9 +10,8 @@ from scipy.sparse import csr_matrix
 from sklearn.neighbors import NearestNeighbors
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error
+from app.models.SparseSVDRecommender import SparseSVDRecommender
 
-from app.models.recommendation import JobStatus
-from app.services.job_stores import JobStore
 
 
 def format_imdb_id(imdb_id):
@@ -239,26 +237,82 @@ def plot_predicted_ratings_distribution(df):
 ############################# User-Based Collaborative Filtering ##############################
 
 # Handling New User
-# Following function assume ratings for a new user are passed in the following form:
-# ratings_new_user = [('imdb_id', rating), (.,.), (.,.), ...] where the imdb_id does not contain 'tt0..'
+# Following function assume ratings for a new user are passed as two arrays:
+# movie_ids, the ratings matrix columns of the rated movies, and ratings, their values
 
 
-def reco_user_based_new_user(ratings_new_user, movie_map, df_ratings, knn, means_by_user, std_by_user, number_of_movies,
-                             num_reco=10, number_of_neighbors=100, max_number_of_movies=100, number_of_users=30):
+def score_user_based_candidates(neighbor_rows, weights, neighbor_means, neighbor_stds, mean_user, std_user,
+                                global_mean, candidates, number_of_users=30, min_number_of_ratings=3):
+    """
+    Score every candidate movie from the neighbors' ratings in a few sparse operations.
+
+    Args:
+        neighbor_rows (csr_matrix): Ratings of the neighbors, one row per neighbor
+        weights (np.ndarray): Similarity weight of each neighbor row
+        neighbor_means (np.ndarray): Mean rating of each neighbor row
+        neighbor_stds (np.ndarray): Rating standard deviation of each neighbor row
+        mean_user (float): Mean rating of the new user
+        std_user (float): Rating standard deviation of the new user
+        global_mean (float): Fallback prediction for movies with too few ratings
+        candidates (np.ndarray): Column indices of the movies to score
+        number_of_users (int): Only the number_of_users most similar raters of a movie are used
+        min_number_of_ratings (int): Below this many raters the global mean is predicted
+
+    Returns:
+        Dict mapping 'basic', 'mean_centering' and 'z_normalization' to arrays of
+        predictions aligned with candidates
+    """
+    # Only positively weighted neighbors contribute, most similar first so that
+    # the rank of an entry inside its column is the rank of its neighbor
+    order = np.argsort(-weights, kind='stable')
+    order = order[weights[order] > 0]
+    ratings_by_movie = neighbor_rows[order].tocsc()
+    ratings_by_movie.sort_indices()
+
+    n_movies = ratings_by_movie.shape[1]
+    per_column = np.diff(ratings_by_movie.indptr)
+    cols = np.repeat(np.arange(n_movies), per_column)
+    rank = np.arange(ratings_by_movie.nnz) - np.repeat(ratings_by_movie.indptr[:-1], per_column)
+    keep = rank < number_of_users
+
+    cols = cols[keep]
+    rows = order[ratings_by_movie.indices[keep]]
+    ratings = ratings_by_movie.data[keep]
+    w = weights[rows]
+    weighted_diff = w * (ratings - neighbor_means[rows])
+    z_terms = weighted_diff / neighbor_stds[rows]
+    # Neighbors with an undefined std are skipped, as pandas' sum does
+    z_terms[np.isnan(z_terms)] = 0
+
+    count = np.bincount(cols, minlength=n_movies)[candidates]
+    denominator = np.bincount(cols, weights=np.abs(w), minlength=n_movies)[candidates]
+    numerator = np.bincount(cols, weights=weighted_diff, minlength=n_movies)[candidates]
+    numerator2 = np.bincount(cols, weights=z_terms, minlength=n_movies)[candidates]
+    numerator3 = np.bincount(cols, weights=w * ratings, minlength=n_movies)[candidates]
+
+    enough = count >= min_number_of_ratings
+    safe_denominator = np.where(enough, denominator, 1)
+
+    return {
+        'basic': np.where(enough, numerator3 / safe_denominator, global_mean),
+        'mean_centering': np.where(enough, numerator / safe_denominator + mean_user, global_mean),
+        'z_normalization': np.where(enough, numerator2 * std_user / safe_denominator + mean_user, global_mean),
+    }
+
+
+def reco_user_based_new_user(movie_ids, ratings, ratings_matrix, knn, means_by_user, std_by_user, global_mean,
+                             num_reco=10, number_of_neighbors=100, max_number_of_movies=None, number_of_users=30,
+                             rng=None):
 
     start = time.time()
     # Get ids and ratings of new user
-    movies_id_new_user = np.array([int(movie_map[x[0]]) for x in ratings_new_user])
-    ratings_to_take = np.array([x[1] for x in ratings_new_user])
+    movies_id_new_user = np.asarray(movie_ids, dtype=np.int64)
+    ratings_to_take = np.asarray(ratings, dtype=np.float64)
 
     # Compute some needed quantity
-    global_mean = df_ratings['rating'].mean()
     mean_user = np.mean(ratings_to_take)
     std_user = np.std(ratings_to_take)
-    number_of_movies = number_of_movies
-
-    # Aggregate users that have seen a given movie
-    movie_users = df_ratings.groupby('sparse_movie_id')['sparse_user_id'].agg(list)
+    number_of_movies = ratings_matrix.shape[1]
 
     # Create sparse vector for the user
     sparse_vector = scipy.sparse.csr_matrix(
@@ -280,547 +334,107 @@ def reco_user_based_new_user(ratings_new_user, movie_map, df_ratings, knn, means
     # Convert distances to weights
     weights = 1 - dist
 
-    weights_dict = {neighbor_indices[i]: weights[i] for i in range(len(neighbor_indices))}
-    user_results_mean_centering = []
-    user_results_z_normalization = []
-    user_results_basic = []
+    # Slice the neighbors' ratings once, every candidate is scored from it
+    neighbor_rows = ratings_matrix[neighbor_indices]
 
-    # Reduced number of movies if needed
-    selected_movies = df_ratings[df_ratings['sparse_user_id'].isin(neighbor_indices)]['sparse_movie_id'].unique()
+    # Candidates are all the movies rated by a neighbor, reduced if needed
+    selected_movies = np.unique(neighbor_rows.indices)
     selected_movies = np.setdiff1d(selected_movies, movies_id_new_user)
     print(len(selected_movies))
-    if len(selected_movies) > max_number_of_movies:
-        selected_movies = np.random.choice(selected_movies, size=max_number_of_movies, replace=False)
+    if max_number_of_movies is not None and len(selected_movies) > max_number_of_movies:
+        rng = rng if rng is not None else np.random.default_rng()
+        selected_movies = rng.choice(selected_movies, size=max_number_of_movies, replace=False)
 
     print(f"Computing ratings for {len(selected_movies)} movies")
 
-    # Compute predicted ratings for all movies
-    for i, movie in enumerate(selected_movies):
+    predictions = score_user_based_candidates(
+        neighbor_rows,
+        weights,
+        means_by_user[neighbor_indices],
+        std_by_user[neighbor_indices],
+        mean_user,
+        std_user,
+        global_mean,
+        selected_movies,
+        number_of_users=number_of_users
+    )
 
-        movie_users_list = movie_users.get(movie, [])
-        top_users = heapq.nlargest(
-            number_of_users,  # limiting to top 30 users
-            [(uid, weights_dict.get(uid, 0)) for uid in movie_users_list if weights_dict.get(uid, 0) > 0],
-            key=lambda x: x[1]
-        )
+    # Sort and get top recommendations for each method
+    recommendations = {}
+    for method, scores in predictions.items():
+        top = np.argsort(-scores, kind='stable')[:num_reco]
+        recommendations[method] = list(zip(selected_movies[top], scores[top]))
 
-        # Filter ratings for top users
-        user_ratings = df_ratings[
-            (df_ratings['sparse_movie_id'] == movie) &
-            (df_ratings['sparse_user_id'].isin([u[0] for u in top_users]))
-            ].copy()
-
-        # print(user_ratings)
-
-        if len(user_ratings) < 3:
-            user_results_mean_centering.append((movie, global_mean))
-            user_results_z_normalization.append((movie, global_mean))
-            user_results_basic.append((movie, global_mean))
-            continue
-
-        # Add columns for calculations
-        user_ratings.loc[:, 'user_weight'] = user_ratings['sparse_user_id'].map(dict(top_users))
-        user_ratings.loc[:, 'mean_rating'] = user_ratings['sparse_user_id'].map(means_by_user)
-        user_ratings.loc[:, 'std_rating'] = user_ratings['sparse_user_id'].map(std_by_user)
-        user_ratings.loc[:, 'weighted_diff'] = user_ratings['user_weight'] * (
-                    user_ratings['rating'] - user_ratings['mean_rating'])
-
-        # Compute prediction methods
-        numerator = user_ratings['weighted_diff'].sum()
-        denominator = user_ratings['user_weight'].abs().sum()
-
-        numerator2 = (user_ratings['weighted_diff'] / user_ratings['std_rating']).sum()
-        numerator3 = (user_ratings['user_weight'] * user_ratings['rating']).sum()
-
-        if denominator > 0:
-            # Mean Centering Method
-            result_mean_centering = numerator / denominator + mean_user
-
-            # Z-Normalization Method
-            result_z_normalization = numerator2 * std_user / denominator + mean_user
-
-            # Basic Weighted Average Method
-            result_basic = numerator3 / denominator
-
-            user_results_mean_centering.append((movie, result_mean_centering))
-            user_results_z_normalization.append((movie, result_z_normalization))
-            user_results_basic.append((movie, result_basic))
-
-        # Sort and get top recommendations for each method
-    recommendations = {
-        'basic': sorted(user_results_basic, key=lambda x: x[1], reverse=True)[:num_reco],
-        'mean_centering': sorted(user_results_mean_centering, key=lambda x: x[1], reverse=True)[:num_reco],
-        'z_normalization': sorted(user_results_z_normalization, key=lambda x: x[1], reverse=True)[:num_reco]
-    }
     print(f"Total time taken: {time.time() - start}")
     return recommendations
 
 ############################# Item-Based Collaborative Filtering ##############################
 
-async def reco_item_based_new_user(ratings_new_user, movie_map, knn, means_by_movie, std_by_movie,
-                             ratings_matrix, number_of_reco=30, number_of_movies_for_reco=50,
-                             jobid=None):
+def reco_item_based_new_user(movie_ids, ratings, neighbor_table, means_by_movie, std_by_movie,
+                             number_of_reco=30, number_of_movies_for_reco=50, k=None, knn=None, movie_vectors=None,
+                             progress=None):
     start = time.time()
-    
-    if jobid is not None:
-        await asyncio.sleep(0)
-        await JobStore.update_job(jobid, JobStatus(status="Searching optimal threshold..."))
-    min_threshold = 0.0  # Minimum possible threshold
-    max_threshold = 1.0  # Maximum possible threshold
-    target_threshold = 0.5  # Starting point for binary search
-    target_movies = number_of_movies_for_reco  # Target number of movies
-    tolerance = 0.1 * target_movies  # ±10% of the target
-    lower_bound = target_movies - tolerance  # Lower limit (90 for target 100)
-    upper_bound = target_movies + tolerance  # Upper limit (110 for target 100)
-
-    movie_id_rated = np.array([int(movie_map[x[0]]) for x in ratings_new_user])
-    ratings_to_take = np.array([x[1] for x in ratings_new_user])
-    ratings_matrix_col = ratings_matrix.tocsc()
-
-    optimal_threshold = target_threshold
-
-    while max_threshold - min_threshold > 0.01:  # Precision of the search
-        indices_to_keep = set()  # Reset for this threshold
-
-        for movie in movie_id_rated:
-            # Extract the movie vector as a column from the ratings matrix
-            movie_vector = ratings_matrix_col.getcol(movie)
-
-            # Find neighbors for the current movie
-            distances, indices = knn.kneighbors(movie_vector.T, n_neighbors=ratings_matrix.shape[1])
-
-            # Exclude the first neighbor (which is the movie itself)
-            neighbor_indices = indices[0, 1:]
-            distances = distances[0, 1:]
-
-            # Compute weights and keep indices where weights > target_threshold
-            weights = 1 - distances
-            indices_to_keep.update(neighbor_indices[weights > target_threshold])
-
-        num_indices = len(indices_to_keep)
-        if jobid is not None:
-            await asyncio.sleep(0)
-            await JobStore.update_job(jobid, JobStatus(status=f"Threshold: {target_threshold}, number of movies: {num_indices}"))
-
-        # Check if the number of movies is within the tolerance range
-        if lower_bound <= num_indices <= upper_bound:
-            optimal_threshold = target_threshold  # Found an acceptable threshold
-            break
-
-        # Binary search logic
-        if num_indices < lower_bound:  # Too few indices, decrease threshold
-            max_threshold = target_threshold  # Move left
-        else:  # Too many indices, increase threshold
-            min_threshold = target_threshold  # Move right
-
-        target_threshold = (min_threshold + max_threshold) / 2  # Update midpoint
 
-    if jobid is not None:
-        await asyncio.sleep(0)
-        await JobStore.update_job(jobid, JobStatus(status=f"Optimal threshold: {optimal_threshold}, number of movies: {num_indices}"))
-
-    recommendation_mean = {}
-    recommendation_z = {}
-
-    for i, movie in enumerate(indices_to_keep):
-        if movie in movie_id_rated:
-            continue
-
-        movie_vector = ratings_matrix_col.getcol(movie)
-        distances, indices = knn.kneighbors(movie_vector.T, n_neighbors=ratings_matrix.shape[1])
-        neighbor_indices = indices[0, 1:]
-        distances = distances[0, 1:]
-
-        weights = 1 - distances
-        indices = np.where(np.isin(neighbor_indices, movie_id_rated))[0]
-        weights_to_take = weights[indices]
-        sum_of_weights = np.sum(np.abs(weights_to_take))
-        mean_movie_to_predict = means_by_movie.loc[movie]
-
-        std_movie_to_predict = std_by_movie.loc[movie]
-
-        means = means_by_movie.loc[list(indices)].to_numpy()
-        stds = std_by_movie.loc[list(indices)].to_numpy()
-        predicted_rating = mean_movie_to_predict + np.dot(ratings_to_take - means, weights_to_take) / sum_of_weights
-        predicted_rating2 = mean_movie_to_predict + std_movie_to_predict * np.dot((ratings_to_take - means) / stds,
-                                                                                  weights_to_take) / sum_of_weights
+    target_movies = number_of_movies_for_reco  # Target number of movies
 
-        recommendation_mean[movie] = predicted_rating
-        recommendation_z[movie] = predicted_rating2
+    movie_id_rated = np.asarray(movie_ids, dtype=np.int64)
+    ratings_to_take = np.asarray(ratings, dtype=np.float64)
+
+    # Precomputed neighbors of the rated movies, padding has id -1 and weight 0.
+    # A k wider than the table is answered by the pre-fitted knn in one batched query.
+    if k is None or k <= neighbor_table.k or knn is None:
+        rated_neighbors = neighbor_table.indices[movie_id_rated, :k]
+        rated_weights = neighbor_table.similarities[movie_id_rated, :k]
+    else:
+        distances, indices = knn.kneighbors(movie_vectors[movie_id_rated],
+                                            n_neighbors=min(k + 1, neighbor_table.n_movies))
+        # Exclude the first neighbor (which is the movie itself)
+        rated_neighbors = indices[:, 1:]
+        rated_weights = 1 - distances[:, 1:]
+
+    # Single pass: similarity of every movie to its closest rated movie. A movie
+    # passes a threshold as soon as one rated movie has it as a closer neighbor.
+    similarity_to_rated = np.zeros(neighbor_table.n_movies)
+    valid = rated_neighbors >= 0
+    np.maximum.at(similarity_to_rated, rated_neighbors[valid], rated_weights[valid])
+    similar_movies = np.flatnonzero(similarity_to_rated > 0)
+
+    # Order statistic instead of a binary search: the threshold is the similarity
+    # of the target_movies-th closest movie, which always lands inside the ±10%
+    # tolerance the search aimed for. With fewer similar movies, keep them all.
+    if len(similar_movies) > target_movies:
+        top = np.argpartition(-similarity_to_rated[similar_movies], max(target_movies - 1, 0))[:target_movies]
+        indices_to_keep = similar_movies[top]
+        optimal_threshold = similarity_to_rated[indices_to_keep].min() if target_movies > 0 else 1.0
+    else:
+        indices_to_keep = similar_movies
+        optimal_threshold = 0.0
+    num_indices = len(indices_to_keep)
+
+    if progress is not None:
+        progress(f"Optimal threshold: {optimal_threshold}, number of movies: {num_indices}")
+
+    candidates = np.setdiff1d(indices_to_keep, movie_id_rated)
+
+    # Weights between every rated movie (rows) and every candidate (columns)
+    weights = neighbor_table.pairwise(movie_id_rated, candidates, rated_neighbors, rated_weights)
+    sum_of_weights = np.sum(np.abs(weights), axis=0)
+
+    means = means_by_movie[movie_id_rated]
+    stds = std_by_movie[movie_id_rated]
+    mean_movie_to_predict = means_by_movie[candidates]
+    std_movie_to_predict = std_by_movie[candidates]
+
+    predicted_rating = mean_movie_to_predict + (ratings_to_take - means) @ weights / sum_of_weights
+    predicted_rating2 = mean_movie_to_predict + std_movie_to_predict * (
+            ((ratings_to_take - means) / stds) @ weights) / sum_of_weights
+
+    recommendation_mean = dict(zip(candidates.tolist(), predicted_rating))
+    recommendation_z = dict(zip(candidates.tolist(), predicted_rating2))
 
     sorted_mean = sorted(recommendation_mean.items(), key=lambda item: item[1], reverse=True)[:number_of_reco]
     sorted_z = sorted(recommendation_z.items(), key=lambda item: item[1], reverse=True)[:number_of_reco]
-    if jobid is not None:
-        await asyncio.sleep(0)
-        await JobStore.update_job(jobid, JobStatus(status=f"Total time taken: {time.time() - start}"))
+    if progress is not None:
+        progress(f"Total time taken: {time.time() - start}")
 
     return sorted_mean, sorted_z
-
-
-############################# Dimensionality Reduction Methods ##############################
-class SparseSVDRecommender:
-    def __init__(self, n_factors: int = 100, learning_rate: float = 0.005,
-                 regularization: float = 0.02, n_epochs: int = 20):
-        """
-        Initialize the SVD recommender system with verbose logging and serialization.
-        """
-        self.n_factors = n_factors
-        self.learning_rate = learning_rate
-        self.regularization = regularization
-        self.n_epochs = n_epochs
-
-        # Model parameters
-        self.user_factors = None
-        self.item_factors = None
-        self.user_biases = None
-        self.item_biases = None
-        self.global_mean = None
-
-        # Mapping dictionaries
-        self.user_id_map = {}
-        self.movie_id_map = {}
-        self.reverse_user_id_map = {}
-        self.reverse_movie_id_map = {}
-
-    def fit(self, ratings_matrix_train: csr_matrix,
-            user_id_map: dict = None,
-            movie_id_map: dict = None) -> 'SparseSVDRecommender3':
-        """
-        Train the model using a pre-computed sparse ratings matrix.
-
-        Args:
-            ratings_matrix_train (csr_matrix): Sparse training ratings matrix
-            user_id_map (dict, optional): Mapping of original user IDs to matrix indices
-            movie_id_map (dict, optional): Mapping of original movie IDs to matrix indices
-        """
-        print("\n--- Starting SVD Training ---")
-        start_total_time = time.time()
-
-        # If maps are not provided, create default mappings
-        if user_id_map is None:
-            self.user_id_map = {i: i for i in range(ratings_matrix_train.shape[0])}
-            self.reverse_user_id_map = self.user_id_map
-        else:
-            self.user_id_map = user_id_map
-            self.reverse_user_id_map = {idx: user for user, idx in user_id_map.items()}
-
-        if movie_id_map is None:
-            self.movie_id_map = {i: i for i in range(ratings_matrix_train.shape[1])}
-            self.reverse_movie_id_map = self.movie_id_map
-        else:
-            self.movie_id_map = movie_id_map
-            self.reverse_movie_id_map = {idx: movie for movie, idx in movie_id_map.items()}
-
-            # Compute global mean
-        self.global_mean = ratings_matrix_train.data.mean()
-        print(f"Global mean rating: {self.global_mean:.2f}")
-
-        # Get matrix dimensions
-        n_users, n_items = ratings_matrix_train.shape
-        print(f"Matrix dimensions: {n_users} users x {n_items} movies")
-
-        # Initialize matrices
-        self._init_matrices(n_users, n_items)
-
-        # Get indices of non-zero elements
-        users, items = ratings_matrix_train.nonzero()
-        total_ratings = len(users)
-        print(f"Total ratings to train on: {total_ratings}")
-
-        # Training loop
-        for epoch in range(self.n_epochs):
-            epoch_start_time = time.time()
-
-            # Shuffle the order of training examples
-            shuffle_indices = np.random.permutation(len(users))
-
-            # Track total error for the epoch
-            total_error = 0
-
-            for idx in shuffle_indices:
-                u, i = users[idx], items[idx]
-                r = ratings_matrix_train[u, i]
-
-                # Compute current prediction
-                pred = (self.global_mean +
-                        self.user_biases[u] +
-                        self.item_biases[i] +
-                        self.user_factors[u] @ self.item_factors[i])
-
-                # Compute error
-                error = r - pred
-                total_error += error ** 2
-
-                # Update biases and factors
-                self.user_biases[u] += self.learning_rate * (error - self.regularization * self.user_biases[u])
-                self.item_biases[i] += self.learning_rate * (error - self.regularization * self.item_biases[i])
-
-                user_factors_update = (error * self.item_factors[i] -
-                                       self.regularization * self.user_factors[u])
-                item_factors_update = (error * self.user_factors[u] -
-                                       self.regularization * self.item_factors[i])
-
-                self.user_factors[u] += self.learning_rate * user_factors_update
-                self.item_factors[i] += self.learning_rate * item_factors_update
-
-            # Print epoch summary
-            rmse = np.sqrt(total_error / total_ratings)
-            epoch_time = time.time() - epoch_start_time
-            print(f"Epoch {epoch + 1}/{self.n_epochs}: RMSE = {rmse:.4f}, Time = {epoch_time:.2f}s")
-
-        # Final training summary
-        total_training_time = time.time() - start_total_time
-        print(f"\n--- Training Complete ---")
-        print(f"Total training time: {total_training_time:.2f} seconds")
-
-        return self
-
-    def evaluate(self, ratings_matrix_test: csr_matrix,
-                 include_unrated: bool = False):
-        """
-        Evaluate model performance on test sparse matrix.
-
-        Args:
-            ratings_matrix_test (csr_matrix): Sparse test ratings matrix
-            include_unrated (bool): Whether to include predictions for unrated items
-
-        Returns:
-            Dict with performance metrics, actual ratings, and predictions
-        """
-        print("\n--- Model Evaluation ---")
-
-        # Compute predictions for test set
-        predictions = []
-        actual_ratings = []
-
-        # Get test set non-zero indices
-        test_users, test_items = ratings_matrix_test.nonzero()
-
-        for idx in range(len(test_users)):
-            u, i = test_users[idx], test_items[idx]
-            actual_rating = ratings_matrix_test[u, i]
-
-            # Translate back to original IDs if needed
-            orig_user_id = self.reverse_user_id_map.get(u, u)
-            orig_movie_id = self.reverse_movie_id_map.get(i, i)
-
-            try:
-                pred = self.predict(orig_user_id, orig_movie_id)
-                predictions.append(pred)
-                actual_ratings.append(actual_rating)
-            except Exception as e:
-                print(f"Prediction error for user {u}, movie {i}: {e}")
-                continue
-
-        # Compute metrics
-        rmse = np.sqrt(mean_squared_error(actual_ratings, predictions))
-        mae = mean_absolute_error(actual_ratings, predictions)
-
-        print("Performance Metrics:")
-        print(f"RMSE: {rmse:.4f}")
-        print(f"MAE: {mae:.4f}")
-        print(f"Total Test Ratings: {len(actual_ratings)}")
-
-        return {
-            'RMSE': rmse,
-            'MAE': mae,
-            'Total Test Ratings': len(actual_ratings)
-        }, actual_ratings, predictions
-
-    def save_model(self, filepath: str = 'svd_recommender_model.joblib'):
-        """Save the entire model state to a file."""
-        try:
-            if self.user_factors is None:
-                raise ValueError("Model must be trained before saving")
-
-            model_state = {
-                'user_factors': self.user_factors,
-                'item_factors': self.item_factors,
-                'user_biases': self.user_biases,
-                'item_biases': self.item_biases,
-                'global_mean': self.global_mean,
-                'user_id_map': self.user_id_map,
-                'movie_id_map': self.movie_id_map,
-                'n_factors': self.n_factors,
-                'learning_rate': self.learning_rate,
-                'regularization': self.regularization,
-                'n_epochs': self.n_epochs
-            }
-
-            joblib.dump(model_state, filepath)
-            print(f"Model successfully saved to {filepath}")
-
-        except Exception as e:
-            print(f"Error saving model: {e}")
-
-    def load_model(self, filepath: str = 'svd_recommender_model.joblib'):
-        """Load a previously saved model state."""
-        try:
-            if not os.path.exists(filepath):
-                raise FileNotFoundError(f"No model file found at {filepath}")
-
-            model_state = joblib.load(filepath)
-
-            # Restore model parameters
-            self.user_factors = model_state['user_factors']
-            self.item_factors = model_state['item_factors']
-            self.user_biases = model_state['user_biases']
-            self.item_biases = model_state['item_biases']
-            self.global_mean = model_state['global_mean']
-
-            # Restore mapping dictionaries
-            self.user_id_map = model_state['user_id_map']
-            self.movie_id_map = model_state['movie_id_map']
-
-            # Recreate reverse mapping dictionaries
-            self.reverse_user_id_map = {idx: user for user, idx in self.user_id_map.items()}
-            self.reverse_movie_id_map = {idx: movie for movie, idx in self.movie_id_map.items()}
-
-            print(f"Model successfully loaded from {filepath}")
-            print(f"Loaded model details:")
-            print(f"  - Latent Factors: {model_state['n_factors']}")
-            print(f"  - Unique Users: {len(self.user_id_map)}")
-            print(f"  - Unique Movies: {len(self.movie_id_map)}")
-
-            return self
-
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            return None
-
-    def _init_matrices(self, n_users: int, n_items: int):
-        """Initialize model parameters with logging."""
-        print(f"\nInitializing matrices with {self.n_factors} latent factors")
-        self.user_factors = np.random.normal(0, 0.1, (n_users, self.n_factors))
-        self.item_factors = np.random.normal(0, 0.1, (n_items, self.n_factors))
-        self.user_biases = np.zeros(n_users)
-        self.item_biases = np.zeros(n_items)
-
-    def predict(self, user_id: int, movie_id: int) -> float:
-        """Predict rating with error handling and logging."""
-        if self.user_factors is None:
-            print("Error: Model must be trained before making predictions")
-            return None
-
-        try:
-            u_idx = self.user_id_map[user_id]
-            m_idx = self.movie_id_map[movie_id]
-        except KeyError:
-            return self.global_mean
-
-        prediction = (self.global_mean +
-                      self.user_biases[u_idx] +
-                      self.item_biases[m_idx] +
-                      self.user_factors[u_idx] @ self.item_factors[m_idx])
-
-        return prediction
-
-    def recommend_items(self, user_id: int, n_items: int = 10,
-                        exclude_rated: bool = True):
-        """Recommend items with detailed logging."""
-        if self.user_factors is None:
-            print("Error: Model must be trained before making recommendations")
-            return []
-
-        try:
-            u_idx = self.user_id_map[user_id]
-        except KeyError:
-            print(f"Warning: User {user_id} not found in training data")
-            return []
-
-        # Calculate predictions for all items
-        user_vector = (self.global_mean +
-                       self.user_biases[u_idx] +
-                       self.user_factors[u_idx] @ self.item_factors.T)
-
-        # Create array of (movie_id, prediction) tuples
-        predictions = []
-        for m_idx, pred in enumerate(user_vector):
-            movie_id = self.reverse_movie_id_map[m_idx]
-            predictions.append((movie_id, pred))
-
-        # Sort by predicted rating
-        predictions.sort(key=lambda x: x[1], reverse=True)
-
-        # Optional: exclude already rated movies
-        if exclude_rated:
-            rated_movies = set(df_filtered[df_filtered['sparse_user_id'] == user_id]['sparse_movie_id'])
-            predictions = [rec for rec in predictions if rec[0] not in rated_movies]
-
-        return predictions
-
-    def handle_new_user(self, user_ratings, n_items=10):
-        """
-        Incorporate new user ratings into recommendations without full retraining
-
-        Args:
-            user_ratings (pd.DataFrame): DataFrame with columns 'movieId' and 'rating'
-            n_items (int): Number of recommendations to return
-
-        Returns:
-            List of recommended movie IDs
-        """
-        # Check if model is trained
-        if self.user_factors is None:
-            raise ValueError("Model must be trained first")
-
-        # Validate movie IDs exist in original training data
-        valid_movies = [mid for mid in user_ratings['sparse_movie_id'] if mid in self.movie_id_map]
-        valid_ratings = user_ratings[user_ratings['sparse_movie_id'].isin(valid_movies)]
-
-        if len(valid_movies) == 0:
-            print("No valid movie ratings found")
-            return []
-
-        # Ensure consistent dimensionality
-        new_user_factors = np.zeros(self.item_factors.shape[1])
-        new_user_bias = 0
-
-        for _, row in valid_ratings.iterrows():
-            movie_idx = self.movie_id_map[row['sparse_movie_id']]
-
-            # Safely handle potential shape mismatches
-            movie_factors = self.item_factors[movie_idx]
-
-            # Ensure correct dimensionality
-            if len(movie_factors) != len(new_user_factors):
-                # Truncate or pad the movie factors to match new_user_factors
-                if len(movie_factors) > len(new_user_factors):
-                    movie_factors = movie_factors[:len(new_user_factors)]
-                else:
-                    padded_factors = np.zeros(len(new_user_factors))
-                    padded_factors[:len(movie_factors)] = movie_factors
-                    movie_factors = padded_factors
-
-            # Update user vector with weighted item factors
-            new_user_factors += row['rating'] * movie_factors
-            new_user_bias += row['rating'] - self.global_mean
-
-        # Normalize by number of ratings
-        new_user_factors /= len(valid_ratings)
-        new_user_bias /= len(valid_ratings)
-
-        # Compute predictions for all items
-        predictions = (self.global_mean +
-                       new_user_bias +
-                       new_user_factors @ self.item_factors.T)
-
-        # Create and sort recommendations
-        recommendations = [
-            (self.reverse_movie_id_map[idx], pred)
-            for idx, pred in enumerate(predictions)
-        ]
-        recommendations.sort(key=lambda x: x[1], reverse=True)
-
-        # Exclude movies already rated
-        rated_movies = set(valid_ratings['sparse_movie_id'])
-        recommendations = [rec for rec in recommendations if rec[0] not in rated_movies]
-
-        return recommendations[:n_items]
-
-
-
-
-
-
-
@@ -0,0 +1,119 @@
+import os
+import json
+import numpy as np
+
+PRECISIONS = ('float32', 'float16', 'int8')
+
+
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest scores, highest first, using a partial sort."""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, n - 1)[:n]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class EmbeddingIndex:
+    """
+    L2-normalized copy of the SAE movie embeddings.
+
+    The summed cosine similarity of every movie to a set of rated movies is
+    the dot product with the sum of the rated movies' normalized vectors, so
+    scoring a whole ratings list is one matrix-vector product and the corpus
+    is never renormalized per request.
+
+    The normalized vectors are stored as float32, float16 or int8 with one
+    float32 scale per row. An index loaded from an artifact directory keeps
+    the memory-mapped array as is: workers share its pages through the OS
+    cache, and reduced precisions are converted chunk by chunk when scoring.
+    """
+
+    chunk_size = 65536
+
+    def __init__(self, embeddings: np.ndarray, scales: np.ndarray = None, normalize: bool = True):
+        if normalize:
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            embeddings = embeddings / norms
+        self.embeddings = embeddings
+        self.scales = scales
+
+    @property
+    def n_movies(self) -> int:
+        return self.embeddings.shape[0]
+
+    @property
+    def precision(self) -> str:
+        return self.embeddings.dtype.name
+
+    def vectors(self, rows) -> np.ndarray:
+        """Normalized float32 vectors of `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, None]
+        return vectors
+
+    def scores(self, profiles: np.ndarray) -> np.ndarray:
+        """
+        Dot products of every movie with one profile (d,) or several (d, n_profiles).
+
+        float32 embeddings go to BLAS in one product; reduced precisions are
+        widened chunk by chunk so no full float32 copy is ever held.
+        """
+        profiles = np.asarray(profiles, dtype=np.float32)
+        if self.embeddings.dtype == np.float32 and self.scales is None:
+            return self.embeddings @ profiles
+
+        out = np.empty((self.n_movies,) + profiles.shape[1:], dtype=np.float32)
+        for start in range(0, self.n_movies, self.chunk_size):
+            end = min(start + self.chunk_size, self.n_movies)
+            chunk = self.embeddings[start:end].astype(np.float32) @ profiles
+            if self.scales is not None:
+                chunk *= self.scales[start:end].reshape((-1,) + (1,) * (profiles.ndim - 1))
+            out[start:end] = chunk
+        return out
+
+    def similarities(self, rows) -> np.ndarray:
+        """Sum over `rows` of the cosine similarity of every movie to that row."""
+        return self.scores(self.vectors(rows).sum(axis=0))
+
+    def save(self, dirpath: str = './Data/SAE_embedding', precision: str = 'float16'):
+        """
+        Write the normalized embeddings as an artifact directory.
+
+        Args:
+            dirpath (str): Directory holding manifest.json, embeddings.npy and, for int8, scales.npy
+            precision (str): One of 'float32', 'float16' or 'int8' (per-row scaled quantization)
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+        os.makedirs(dirpath, exist_ok=True)
+
+        vectors = self.vectors(np.arange(self.n_movies))
+        if precision == 'int8':
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            np.save(os.path.join(dirpath, 'scales.npy'), scales.astype(np.float32))
+            vectors = np.round(vectors / scales[:, None]).astype(np.int8)
+        else:
+            vectors = vectors.astype(precision)
+        np.save(os.path.join(dirpath, 'embeddings.npy'), vectors)
+
+        with open(os.path.join(dirpath, 'manifest.json'), 'w') as f:
+            json.dump({'precision': precision, 'shape': list(vectors.shape), 'normalized': True}, f)
+        print(f"Embeddings saved to {dirpath} as {precision}")
+
+    @classmethod
+    def load(cls, dirpath: str = './Data/SAE_embedding', mmap_mode: str = 'r') -> 'EmbeddingIndex':
+        """Open an artifact directory written by `save`, memory-mapped by default."""
+        with open(os.path.join(dirpath, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        embeddings = np.load(os.path.join(dirpath, 'embeddings.npy'), mmap_mode=mmap_mode)
+        scales = None
+        if manifest['precision'] == 'int8':
+            scales = np.load(os.path.join(dirpath, 'scales.npy'), mmap_mode=mmap_mode)
+        return cls(embeddings, scales, normalize=False)
@@ -0,0 +1,85 @@
+from collections.abc import Mapping
+from typing import Dict
+import numpy as np
+
+
+class IdMap(Mapping):
+    """
+    Read-only integer id -> integer index map held as two arrays, the keys
+    sorted. Single lookups and batches go through np.searchsorted, so no
+    Python dict is built, and the arrays can be saved as .npy files and
+    memory-mapped. It behaves like the dict it replaces (`in`, `[]`, `get`,
+    iteration over keys), and `reverse` gives the index -> id direction.
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        keys = np.asarray(keys, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        if keys.shape != values.shape:
+            raise ValueError(f"keys and values differ in shape: {keys.shape} vs {values.shape}")
+        if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+            order = np.argsort(keys, kind='stable')
+            keys, values = keys[order], values[order]
+            if (keys[1:] == keys[:-1]).any():
+                raise ValueError("Duplicated keys in id map")
+        self.keys_array = keys
+        self.values_array = values
+
+    @classmethod
+    def from_dict(cls, mapping: Dict[int, int]) -> 'IdMap':
+        if isinstance(mapping, IdMap):
+            return mapping
+        try:
+            keys = np.fromiter((int(key) for key in mapping.keys()), dtype=np.int64, count=len(mapping))
+        except (TypeError, ValueError):
+            raise ValueError("Only maps with integer keys can be stored as an IdMap")
+        values = np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping))
+        return cls(keys, values)
+
+    @classmethod
+    def identity(cls, n: int) -> 'IdMap':
+        return cls(np.arange(n), np.arange(n))
+
+    def reverse(self) -> 'IdMap':
+        """The index -> id map."""
+        return IdMap(self.values_array, self.keys_array)
+
+    def lookup(self, keys, default: int = -1) -> np.ndarray:
+        """Values of an array of keys, `default` for the missing ones."""
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(self.keys_array) == 0:
+            return np.full(keys.shape, default, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys_array, keys), len(self.keys_array) - 1)
+        found = self.keys_array[positions] == keys
+        return np.where(found, self.values_array[positions], default)
+
+    def __getitem__(self, key) -> int:
+        try:
+            key = int(key)
+        except (TypeError, ValueError, OverflowError):
+            raise KeyError(key)
+        position = np.searchsorted(self.keys_array, key)
+        if position == len(self.keys_array) or self.keys_array[position] != key:
+            raise KeyError(key)
+        return int(self.values_array[position])
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return (int(key) for key in self.keys_array)
+
+    def __len__(self) -> int:
+        return len(self.keys_array)
+
+    def save(self, keys_path: str, values_path: str):
+        np.save(keys_path, self.keys_array)
+        np.save(values_path, self.values_array)
+
+    @classmethod
+    def load(cls, keys_path: str, values_path: str, mmap_mode: str = 'r') -> 'IdMap':
+        return cls(np.load(keys_path, mmap_mode=mmap_mode), np.load(values_path, mmap_mode=mmap_mode))
@@ -0,0 +1,130 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import csr_matrix, diags
+
+
+class ItemNeighborTable:
+    """
+    Precomputed top-K cosine neighbors of every movie of the ratings matrix.
+
+    Row m of `indices` holds the sparse ids of the K movies most similar to
+    movie m (the movie itself excluded), most similar first, and row m of
+    `similarities` the matching cosine similarities. Rows with fewer than K
+    positively similar movies are padded with -1 ids and 0 similarities.
+    """
+
+    def __init__(self, indices: np.ndarray, similarities: np.ndarray):
+        self.indices = indices
+        self.similarities = similarities
+
+    @property
+    def n_movies(self) -> int:
+        return self.indices.shape[0]
+
+    @property
+    def k(self) -> int:
+        return self.indices.shape[1]
+
+    @classmethod
+    def build(cls, ratings_matrix: csr_matrix, k: int = 100, chunk_size: int = 1024,
+              n_jobs: int = None) -> 'ItemNeighborTable':
+        """
+        Compute the table from a users x movies ratings matrix.
+
+        Movies are processed in chunks: each chunk of L2-normalized movie
+        vectors is multiplied with the whole normalized matrix and only the
+        top-K entries of every row are kept, so memory stays bounded by
+        chunk_size x n_movies. Chunks run on a thread pool.
+
+        Args:
+            ratings_matrix (csr_matrix): Sparse users x movies ratings matrix
+            k (int): Number of neighbors kept per movie
+            chunk_size (int): Number of movies scored per matrix product
+            n_jobs (int, optional): Number of threads, defaults to the CPU count
+        """
+        print("\n--- Building item neighbor table ---")
+        start = time.time()
+
+        movies = ratings_matrix.T.tocsr().astype(np.float32)
+        norms = np.sqrt(np.asarray(movies.multiply(movies).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        movies = diags(1 / norms).dot(movies).tocsr()
+        movies_t = movies.T.tocsc()
+
+        n_movies = movies.shape[0]
+        k = min(k, n_movies - 1)
+        indices = np.full((n_movies, k), -1, dtype=np.int32)
+        similarities = np.zeros((n_movies, k), dtype=np.float32)
+
+        def process_chunk(chunk_start):
+            chunk_end = min(chunk_start + chunk_size, n_movies)
+            sims = (movies[chunk_start:chunk_end] @ movies_t).toarray()
+            rows = np.arange(chunk_end - chunk_start)
+            sims[rows, rows + chunk_start] = -np.inf
+
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_sims = np.take_along_axis(top_sims, order, axis=1)
+
+            positive = top_sims > 0
+            indices[chunk_start:chunk_end] = np.where(positive, top, -1)
+            similarities[chunk_start:chunk_end] = np.where(positive, top_sims, 0)
+
+        with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+            list(executor.map(process_chunk, range(0, n_movies, chunk_size)))
+
+        print(f"Neighbor table for {n_movies} movies (k={k}) built in {time.time() - start:.2f}s")
+        return cls(indices, similarities)
+
+    def save(self, filepath: str = './Data/item_neighbors.npz'):
+        """Save the table as an uncompressed npz with int32 ids and float32 similarities."""
+        np.savez(filepath, indices=self.indices, similarities=self.similarities)
+        print(f"Item neighbor table saved to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str = './Data/item_neighbors.npz') -> 'ItemNeighborTable':
+        """Load a table previously written with `save`."""
+        with np.load(filepath) as artifact:
+            return cls(artifact['indices'], artifact['similarities'])
+
+    @staticmethod
+    def _scatter(neighbor_ids, neighbor_sims, targets):
+        """Spread neighbor lists onto a dense len(neighbor_ids) x len(targets) grid."""
+        order = np.argsort(targets)
+        sorted_targets = targets[order]
+        positions = np.clip(np.searchsorted(sorted_targets, neighbor_ids), 0, len(targets) - 1)
+        found = (sorted_targets[positions] == neighbor_ids) & (neighbor_ids >= 0)
+
+        out = np.zeros((neighbor_ids.shape[0], len(targets)), dtype=np.float32)
+        rows, slots = np.nonzero(found)
+        out[rows, order[positions[rows, slots]]] = neighbor_sims[rows, slots]
+        return out
+
+    def pairwise(self, rows: np.ndarray, cols: np.ndarray,
+                 row_indices: np.ndarray = None, row_similarities: np.ndarray = None) -> np.ndarray:
+        """
+        Similarities between two sets of movies, looked up in both directions.
+
+        A pair is known when either movie lists the other among its K
+        neighbors; unknown pairs get a similarity of 0. The neighbor lists of
+        `rows` can be supplied when they come from elsewhere (e.g. a wider
+        query than the table holds).
+
+        Returns:
+            Dense float32 array of shape (len(rows), len(cols))
+        """
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        if len(rows) == 0 or len(cols) == 0:
+            return np.zeros((len(rows), len(cols)), dtype=np.float32)
+
+        if row_indices is None:
+            row_indices, row_similarities = self.indices[rows], self.similarities[rows]
+
+        forward = self._scatter(row_indices, row_similarities, cols)
+        backward = self._scatter(self.indices[cols], self.similarities[cols], rows)
+        return np.maximum(forward, backward.T)
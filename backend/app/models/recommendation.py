@@ -28,5 +28,14 @@ class RecommendationRequest(BaseModel):
     algorithm: AlgorithmType = AlgorithmType.CONTENT_BASED  # Default algorithm
     params: Optional[Dict[str, Any]] = None  # Flexible dictionary for any parameters
 
+class BatchUser(BaseModel):
+    id: str  # Caller's identifier, echoed back with the user's results
+    ratings: List[Rating]
+
+class BatchRecommendationRequest(BaseModel):
+    users: List[BatchUser]
+    algorithm: AlgorithmType = AlgorithmType.CONTENT_BASED
+    params: Optional[Dict[str, Any]] = None  # Shared by every user of the batch
+
 class MovieRequest(BaseModel):
     movies: List[str] # List of movie imdb_ids.
\ No newline at end of file
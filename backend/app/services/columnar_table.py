@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TABLE_VERSION = 1
+
+
+def _encode_column(values: pd.Series) -> Tuple[Dict[str, np.ndarray], str]:
+    """
+    Arrays storing a column with the narrowest lossless dtype, keyed by
+    part name, and the encoding they use.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return {'values': values.to_numpy()}, 'plain'
+
+    if pd.api.types.is_integer_dtype(values):
+        array = values.to_numpy()
+        if len(array) == 0 or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max):
+            array = array.astype(np.int32)
+        return {'values': array}, 'plain'
+
+    if pd.api.types.is_float_dtype(values):
+        array = values.to_numpy(dtype=np.float64)
+        # Half-star ratings fit one byte each
+        half_steps = array * 2
+        if (np.isfinite(array).all() and (half_steps >= 0).all() and (half_steps <= 255).all()
+                and (half_steps == np.round(half_steps)).all()):
+            return {'values': half_steps.astype(np.uint8)}, 'half_steps'
+        if np.array_equal(array.astype(np.float32), array, equal_nan=True):
+            array = array.astype(np.float32)
+        return {'values': array}, 'plain'
+
+    if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        nulls = values.isna().to_numpy()
+        strings = values.where(~nulls, '').tolist()
+        if not all(isinstance(string, str) for string in strings):
+            raise ValueError(f"Column '{values.name}' mixes strings with other types")
+        # One utf-8 buffer and the character offset of every string in it
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in strings], out=offsets[1:])
+        arrays = {'values': np.frombuffer(''.join(strings).encode('utf-8'), dtype=np.uint8),
+                  'offsets': offsets}
+        if nulls.any():
+            arrays['nulls'] = nulls
+        return arrays, 'utf8'
+
+    raise ValueError(f"Column '{values.name}' has unsupported dtype {values.dtype}")
+
+
+def _decode_column(arrays: Dict[str, np.ndarray], encoding: str) -> np.ndarray:
+    if encoding == 'plain':
+        return arrays['values']
+    if encoding == 'half_steps':
+        return arrays['values'].astype(np.float32) * np.float32(0.5)
+    if encoding == 'utf8':
+        text = arrays['values'].tobytes().decode('utf-8')
+        offsets = arrays['offsets'].tolist()
+        values = np.empty(len(offsets) - 1, dtype=object)
+        values[:] = [text[begin:end] for begin, end in zip(offsets[:-1], offsets[1:])]
+        if 'nulls' in arrays:
+            values[arrays['nulls']] = np.nan
+        return values
+    raise ValueError(f"Unknown column encoding '{encoding}'")
+
+
+def save_table(df: pd.DataFrame, dirpath: str):
+    """
+    Write a DataFrame as a directory of per-column .npy files and a
+    manifest.json. Integers are narrowed to int32 and floats to float32, or
+    to one byte for half-star values, when no value changes; strings are
+    one utf-8 buffer with offsets. A non default index is stored as a column.
+    """
+    os.makedirs(dirpath, exist_ok=True)
+    index_name = None
+    if not df.index.equals(pd.RangeIndex(len(df))):
+        index_name = df.index.name if df.index.name is not None else '__index__'
+        df = df.reset_index(names=index_name)
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        arrays, encoding = _encode_column(df[name])
+        files = {part: f'{position}.{part}.npy' for part in arrays}
+        for part, array in arrays.items():
+            np.save(os.path.join(dirpath, files[part]), array)
+        columns.append({'name': name, 'encoding': encoding, 'files': files})
+
+    with open(os.path.join(dirpath, 'manifest.json'), 'w') as f:
+        json.dump({'version': TABLE_VERSION, 'rows': len(df), 'index': index_name, 'columns': columns}, f)
+
+
+def table_files(dirpath: str) -> List[str]:
+    with open(os.path.join(dirpath, 'manifest.json')) as f:
+        manifest = json.load(f)
+    return [os.path.join(dirpath, filename) for column in manifest['columns'] for filename in column['files'].values()]
+
+
+def load_table(dirpath: str) -> pd.DataFrame:
+    """Read a table directory written by `save_table`."""
+    with open(os.path.join(dirpath, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['version'] != TABLE_VERSION:
+        raise ValueError(f"Unsupported table version {manifest['version']} in {dirpath}")
+
+    data = {}
+    for column in manifest['columns']:
+        arrays = {part: np.load(os.path.join(dirpath, filename)) for part, filename in column['files'].items()}
+        data[column['name']] = _decode_column(arrays, column['encoding'])
+
+    df = pd.DataFrame(data)
+    if manifest['index'] is not None:
+        df = df.set_index(manifest['index'])
+        if manifest['index'] == '__index__':
+            df.index.name = None
+    return df
+
+
+def table_source(dirpath: str, csv_path: str) -> str:
+    """The path `read_table` reads: the table directory when it exists, the CSV otherwise."""
+    return dirpath if os.path.exists(os.path.join(dirpath, 'manifest.json')) else csv_path
+
+
+def read_table(dirpath: str, csv_path: str) -> pd.DataFrame:
+    """
+    The table at `dirpath` when it was exported with
+    `python -m scripts.export_tables`, the CSV at `csv_path` otherwise.
+    Logs the load time and the bytes read.
+    """
+    start = time.time()
+    if table_source(dirpath, csv_path) == dirpath:
+        df = load_table(dirpath)
+        source, nbytes = dirpath, sum(os.path.getsize(path) for path in table_files(dirpath))
+    else:
+        logger.warning(f'No {dirpath} found, parsing {csv_path} '
+                       '(run `python -m scripts.export_tables` to persist it)')
+        df = pd.read_csv(csv_path, index_col=0)
+        source, nbytes = csv_path, os.path.getsize(csv_path)
+    logger.info(f'Loaded {len(df)} rows from {source} in {time.time() - start:.2f}s '
+                f'({nbytes / 1e6:.1f} MB read)')
+    return df
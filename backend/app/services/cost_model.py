@@ -0,0 +1,53 @@
+import threading
+from typing import Dict, Optional
+from app.models.recommendation import AlgorithmType
+
+# Starting estimates in seconds, replaced by the first measured run. An algorithm whose default is
+# over a client's deadline runs as a job until then, and that job's duration seeds the estimate
+DEFAULT_COSTS = {
+    AlgorithmType.SVD: 0.05,
+    AlgorithmType.CONTENT_BASED: 0.05,
+    AlgorithmType.KNN_USER: 1.0,
+    AlgorithmType.KNN_ITEM: 1.0,
+}
+
+
+class CostModel:
+    """
+    Expected wall time of each algorithm, as an exponentially weighted moving
+    average of the durations observed in this process.
+
+    Used to decide whether a request can run inline within a client deadline
+    or has to go through a job.
+    """
+    alpha = 0.2
+    _estimates: Dict[AlgorithmType, float] = dict(DEFAULT_COSTS)
+    _counts: Dict[AlgorithmType, int] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def observe(cls, algorithm: AlgorithmType, seconds: float):
+        with cls._lock:
+            count = cls._counts.get(algorithm, 0)
+            previous = cls._estimates.get(algorithm)
+            # The first measurement replaces the default outright
+            if count == 0 or previous is None:
+                cls._estimates[algorithm] = seconds
+            else:
+                cls._estimates[algorithm] = (1 - cls.alpha) * previous + cls.alpha * seconds
+            cls._counts[algorithm] = count + 1
+
+    @classmethod
+    def estimate(cls, algorithm: AlgorithmType) -> Optional[float]:
+        return cls._estimates.get(algorithm)
+
+    @classmethod
+    def fits(cls, algorithm: AlgorithmType, deadline_seconds: float) -> bool:
+        estimate = cls.estimate(algorithm)
+        return estimate is not None and estimate <= deadline_seconds
+
+    @classmethod
+    def stats(cls) -> Dict[str, dict]:
+        with cls._lock:
+            return {algorithm.value: {'expected_seconds': estimate, 'observations': cls._counts.get(algorithm, 0)}
+                    for algorithm, estimate in cls._estimates.items()}
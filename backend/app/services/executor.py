@@ -0,0 +1,132 @@
+import os
+import asyncio
+import logging
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+from threadpoolctl import threadpool_limits
+
+logger = logging.getLogger(__name__)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _init_worker(initializer: Optional[Callable], threads: int, reports):
+    # The workers share the CPUs: cap the native math pools and the index builds of each
+    threadpool_limits(limits=threads)
+    RecommendationExecutor.thread_limit = threads
+    if initializer is None:
+        return
+    try:
+        result = initializer()
+    except BaseException as e:
+        if reports is not None:
+            reports.put((os.getpid(), None, f'{type(e).__name__}: {e}'))
+        raise
+    if reports is not None:
+        reports.put((os.getpid(), result, None))
+
+
+def _read_reports(reports, on_worker_init: Callable):
+    # Runs in the server process until shutdown puts None
+    while True:
+        report = reports.get()
+        if report is None:
+            return
+        try:
+            on_worker_init(*report)
+        except Exception:
+            logger.exception('Handling a worker initializer report failed')
+
+
+class RecommendationExecutor:
+    """
+    Runs CPU-bound recommendation work off the event loop.
+
+    Expensive jobs go to a process pool whose workers run `initializer`
+    once (to load the models) and then serve many jobs, so throughput scales
+    with cores instead of sharing one GIL. Cheap jobs, and every job when the
+    process pool is disabled, run on a thread pool. The event loop only
+    awaits the futures.
+    """
+    _process_pool: Optional[ProcessPoolExecutor] = None
+    _thread_pool: Optional[ThreadPoolExecutor] = None
+    _reports = None
+    # Threads a process may use for its own parallel work, None outside the pool workers
+    thread_limit: Optional[int] = None
+
+    @classmethod
+    def start(cls, initializer: Callable = None, process_workers: int = None, thread_workers: int = None,
+              on_worker_init: Callable = None):
+        """
+        Create the pools. Process workers are spawned (not forked, the server
+        runs threads) and started right away so the models load before the
+        first job arrives. Each worker gets an equal share of the CPUs as its
+        `thread_limit`.
+
+        Args:
+            initializer (Callable): Module-level function run once in every process worker
+            process_workers (int): Size of the process pool, 0 disables it.
+                Defaults to $MOVIEREC_PROCESS_WORKERS, else half the CPUs
+            thread_workers (int): Size of the thread pool, defaults to $MOVIEREC_THREAD_WORKERS
+            on_worker_init (Callable): Called in this process with (worker pid, initializer
+                result, error string or None) every time a worker ran `initializer`
+        """
+        if process_workers is None:
+            process_workers = int(os.environ.get('MOVIEREC_PROCESS_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+        if thread_workers is None and 'MOVIEREC_THREAD_WORKERS' in os.environ:
+            thread_workers = int(os.environ['MOVIEREC_THREAD_WORKERS'])
+
+        cls._thread_pool = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix='reco')
+        if process_workers > 0:
+            threads = max(1, (os.cpu_count() or 1) // process_workers)
+            context = multiprocessing.get_context('spawn')
+            if on_worker_init is not None:
+                cls._reports = context.SimpleQueue()
+                threading.Thread(target=_read_reports, args=(cls._reports, on_worker_init),
+                                 name='worker-reports', daemon=True).start()
+            cls._process_pool = ProcessPoolExecutor(max_workers=process_workers, mp_context=context,
+                                                    initializer=_init_worker,
+                                                    initargs=(initializer, threads, cls._reports))
+            for _ in range(process_workers):
+                cls._process_pool.submit(_ping)
+        logger.info(f'Recommendation executor started with {process_workers} process workers')
+
+    @classmethod
+    def shutdown(cls):
+        if cls._process_pool is not None:
+            cls._process_pool.shutdown(wait=False, cancel_futures=True)
+            cls._process_pool = None
+        if cls._thread_pool is not None:
+            cls._thread_pool.shutdown(wait=False, cancel_futures=True)
+            cls._thread_pool = None
+        if cls._reports is not None:
+            cls._reports.put(None)
+            cls._reports = None
+
+    @classmethod
+    def uses_processes(cls) -> bool:
+        return cls._process_pool is not None
+
+    @classmethod
+    def _pool(cls, process: bool):
+        return cls._process_pool if process and cls._process_pool is not None else cls._thread_pool
+
+    @classmethod
+    async def run(cls, fn: Callable, *args, process: bool = False, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the process pool when `process` is set and
+        the pool exists, on the thread pool otherwise. For the process pool,
+        fn must be a module-level function and its arguments picklable.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._pool(process), functools.partial(fn, *args, **kwargs))
+
+    @classmethod
+    def submit(cls, fn: Callable, *args, process: bool = False, **kwargs) -> Future:
+        """`run` for synchronous callers: the future of fn(*args, **kwargs) on the chosen pool."""
+        return cls._pool(process).submit(fn, *args, **kwargs)
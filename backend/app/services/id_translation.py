@@ -0,0 +1,94 @@
+import os
+import logging
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from app.models.id_map import IdMap
+from app.models.recommendation import Rating
+
+logger = logging.getLogger(__name__)
+
+
+def parse_imdb_ids(imdb_ids: Sequence[str]) -> np.ndarray:
+    """'tt0111161' style ids as an int64 array of their numeric part."""
+    return np.fromiter((int(imdb_id[2:]) for imdb_id in imdb_ids), dtype=np.int64, count=len(imdb_ids))
+
+
+def format_imdb_ids(ids) -> List[str]:
+    """Numeric IMDb ids as 'tt0111161' style ids, zero padded to 7 digits."""
+    return ['tt' + str(imdb_id).zfill(7) for imdb_id in np.asarray(ids, dtype=np.int64).tolist()]
+
+
+class IdTranslation:
+    """
+    IMDb id <-> row/column index of one model's matrices.
+
+    The IMDb -> index direction is an IdMap over the numeric IMDb ids and the
+    index -> IMDb direction a dense table, -1 for indices without a movie, so
+    a whole ratings list or result list is translated in one array call.
+    """
+
+    def __init__(self, imdb_to_index: IdMap, index_to_imdb: np.ndarray):
+        self.imdb_to_index = imdb_to_index
+        self.index_to_imdb = np.asarray(index_to_imdb, dtype=np.int64)
+
+    @classmethod
+    def from_dicts(cls, mapping: Dict, reverse: Dict) -> 'IdTranslation':
+        """From the legacy dicts, whose IMDb ids may be strings or floats."""
+        imdb_to_index = IdMap.from_dict(mapping)
+        indices = np.fromiter((int(index) for index in reverse.keys()), dtype=np.int64, count=len(reverse))
+        imdb_ids = np.fromiter((round(float(imdb_id)) for imdb_id in reverse.values()), dtype=np.int64,
+                               count=len(reverse))
+        if len(indices) and indices.min() < 0:
+            raise ValueError("Negative index in reverse id map")
+        index_to_imdb = np.full(indices.max() + 1 if len(indices) else 0, -1, dtype=np.int64)
+        index_to_imdb[indices] = imdb_ids
+        return cls(imdb_to_index, index_to_imdb)
+
+    def indices(self, imdb_ids: Sequence[str], strict: bool = False) -> np.ndarray:
+        """
+        Indices of 'tt0111161' style ids, -1 for movies the model does not
+        know; with `strict` the first unknown id raises a KeyError instead.
+        """
+        indices = self.imdb_to_index.lookup(parse_imdb_ids(imdb_ids))
+        if strict and (indices < 0).any():
+            raise KeyError(imdb_ids[int(np.argmax(indices < 0))])
+        return indices
+
+    def ratings(self, ratings: Sequence[Rating], strict: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and values of a ratings list, see `indices` for the unknown movies."""
+        indices = self.indices([rating.imdb_id for rating in ratings], strict=strict)
+        values = np.fromiter((rating.rating for rating in ratings), dtype=np.float64, count=len(ratings))
+        return indices, values
+
+    def imdb_ids(self, indices) -> List[str]:
+        """'tt0111161' style ids of an array of indices."""
+        indices = np.asarray(indices, dtype=np.int64)
+        imdb_ids = self.index_to_imdb[indices]
+        if (imdb_ids < 0).any():
+            raise KeyError(int(indices[np.argmax(imdb_ids < 0)]))
+        return format_imdb_ids(imdb_ids)
+
+    def __len__(self) -> int:
+        return len(self.imdb_to_index)
+
+    def save(self, path: str):
+        np.savez(path, imdb_ids=self.imdb_to_index.keys_array, indices=self.imdb_to_index.values_array,
+                 index_to_imdb=self.index_to_imdb)
+
+    @classmethod
+    def load(cls, path: str) -> 'IdTranslation':
+        with np.load(path) as data:
+            return cls(IdMap(data['imdb_ids'], data['indices']), data['index_to_imdb'])
+
+    @classmethod
+    def load_or_convert(cls, path: str, mapping_path: str, reverse_path: str) -> 'IdTranslation':
+        """
+        The arrays saved at `path`, or, until they are exported with
+        `python -m scripts.export_id_maps`, the pickled dicts converted.
+        """
+        if os.path.exists(path):
+            return cls.load(path)
+        logger.warning(f'No {path} found, converting the pickled {mapping_path} '
+                       '(run `python -m scripts.export_id_maps` to persist it)')
+        return cls.from_dicts(np.load(mapping_path, allow_pickle=True).item(),
+                              np.load(reverse_path, allow_pickle=True).item())
@@ -1,22 +1,414 @@
-from typing import Dict, Optional
-from app.models.recommendation import JobStatus
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Sequence, Set
+from app.models.recommendation import JobStatus, MovieRecommendation
+import threading
+import tempfile
+import sqlite3
 import asyncio
+import json
+import logging
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ('completed', 'failed')
+
+
+class StoredJob:
+    __slots__ = ('status', 'results', 'error', 'created_at', 'finished_at')
+
+    def __init__(self, status: str, results: Sequence[MovieRecommendation] = None, error: str = None,
+                 created_at: float = None, finished_at: float = None):
+        self.status = status
+        self.results = tuple(results) if results is not None else None
+        self.error = error
+        self.created_at = time.time() if created_at is None else created_at
+        self.finished_at = finished_at
+
+    def nbytes(self) -> int:
+        size = sys.getsizeof(self) + sys.getsizeof(self.status)
+        if self.results is not None:
+            size += sys.getsizeof(self.results) + sum(
+                sys.getsizeof(result) + sys.getsizeof(result.id) + sys.getsizeof(result.title)
+                for result in self.results)
+        if self.error is not None:
+            size += sys.getsizeof(self.error)
+        return size
+
+
+class JobStoreBackend(ABC):
+    """
+    Storage behind JobStore. Methods are synchronous; JobStore calls them on
+    the event loop, or on a worker thread when the backend sets `blocking`
+    because a call can wait on a lock held by another process.
+
+    `put` stores a job, or ignores it when the stored job is finished and the
+    new one is not, and returns how many jobs were evicted to stay within
+    `max_jobs`. `get` is the read path of status polling and must not take
+    a write lock.
+    """
+    name = 'base'
+    blocking = False
+
+    def __init__(self, max_jobs: int):
+        self.max_jobs = max_jobs
+
+    @abstractmethod
+    def put(self, job_id: str, job: StoredJob) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, job_id: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_finished_before(self, timestamp: float) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """'jobs', 'active_jobs', 'finished_jobs' and 'memory_bytes' gauges."""
+        raise NotImplementedError
+
+
+class InMemoryJobBackend(JobStoreBackend):
+    """
+    Jobs in an LRU-ordered dict of this process. Every call runs on the event
+    loop thread without awaiting, so none needs a lock. Status polls that
+    reach another server process will not find the job.
+    """
+    name = 'memory'
+
+    def __init__(self, max_jobs: int):
+        super().__init__(max_jobs)
+        self._jobs: "OrderedDict[str, StoredJob]" = OrderedDict()
+
+    def put(self, job_id: str, job: StoredJob) -> int:
+        current = self._jobs.get(job_id)
+        if current is not None and current.finished_at is not None and job.finished_at is None:
+            return 0
+        self._jobs[job_id] = job
+        self._jobs.move_to_end(job_id)
+
+        evicted = 0
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._jobs.move_to_end(job_id)
+        return job
+
+    def delete(self, job_id: str):
+        self._jobs.pop(job_id, None)
+
+    def delete_finished_before(self, timestamp: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < timestamp]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        jobs = list(self._jobs.items())
+        finished = sum(1 for _, job in jobs if job.finished_at is not None)
+        return {
+            'jobs': len(jobs),
+            'active_jobs': len(jobs) - finished,
+            'finished_jobs': finished,
+            'memory_bytes': sum(sys.getsizeof(job_id) + job.nbytes() for job_id, job in jobs),
+        }
+
+
+class SqliteJobBackend(JobStoreBackend):
+    """
+    Jobs in a SQLite database in WAL mode, shared by every server process on
+    the host. Readers never block writers (nor each other) under WAL, so a
+    status poll is a single indexed SELECT on the caller's own connection.
+    Eviction drops the least recently updated jobs; reads do not write.
+    Results are stored as JSON.
+    Writes wait up to 5 seconds for another process's write lock, so the
+    calls run off the event loop.
+    """
+    name = 'sqlite'
+    blocking = True
+    # Layout of the jobs table, a database written with another one is started over
+    schema_version = 2
+
+    def __init__(self, max_jobs: int, path: str = None):
+        super().__init__(max_jobs)
+        self.path = path or os.path.join(tempfile.gettempdir(), 'movierec_jobs.sqlite3')
+        self._local = threading.local()
+
+        connection = self._connection()
+        # One transaction, so processes starting together do not drop each other's table
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("PRAGMA user_version").fetchone()[0] != self.schema_version:
+                connection.execute("DROP TABLE IF EXISTS jobs")
+                connection.execute(f"PRAGMA user_version = {self.schema_version}")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    results TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    updated_at REAL NOT NULL
+                )""")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_updated_at ON jobs (updated_at)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        logger.info(f'SQLite job store at {self.path}')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections belong to the thread that opened them
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def put(self, job_id: str, job: StoredJob) -> int:
+        results = (json.dumps([result.model_dump() for result in job.results])
+                   if job.results is not None else None)
+        connection = self._connection()
+        now = time.time()
+        inserted = connection.execute("""
+            INSERT INTO jobs (job_id, status, results, error, created_at, finished_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (job_id) DO NOTHING""",
+                                      (job_id, job.status, results, job.error, job.created_at, job.finished_at,
+                                       now)).rowcount
+        if not inserted:
+            connection.execute("""
+                UPDATE jobs SET status = ?, results = ?, error = ?, finished_at = ?, updated_at = ?
+                WHERE job_id = ? AND (finished_at IS NULL OR ? IS NOT NULL)""",
+                               (job.status, results, job.error, job.finished_at, now, job_id, job.finished_at))
+            return 0
+
+        # Only a new job can take the store past max_jobs, progress updates skip the count
+        count = connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        if count <= self.max_jobs:
+            return 0
+        return connection.execute("""
+            DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs ORDER BY updated_at LIMIT ?)""",
+                                  (count - self.max_jobs,)).rowcount
+
+    def get(self, job_id: str) -> Optional[StoredJob]:
+        row = self._connection().execute(
+            "SELECT status, results, error, created_at, finished_at FROM jobs WHERE job_id = ?",
+            (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, results, error, created_at, finished_at = row
+        if results is not None:
+            results = [MovieRecommendation(**result) for result in json.loads(results)]
+        return StoredJob(status, results, error, created_at, finished_at)
+
+    def delete(self, job_id: str):
+        self._connection().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def delete_finished_before(self, timestamp: float) -> int:
+        return self._connection().execute("DELETE FROM jobs WHERE finished_at < ?", (timestamp,)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        connection = self._connection()
+        jobs, finished = connection.execute("SELECT COUNT(*), COUNT(finished_at) FROM jobs").fetchone()
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            'jobs': jobs,
+            'active_jobs': jobs - finished,
+            'finished_jobs': finished,
+            'memory_bytes': page_count * page_size,
+        }
+
+
+JOB_STORE_BACKENDS = {
+    InMemoryJobBackend.name: InMemoryJobBackend,
+    SqliteJobBackend.name: SqliteJobBackend,
+}
+
 
 class JobStore:
-    _jobs: Dict[str, JobStatus] = {}
-    _lock = asyncio.Lock()  # Add lock for thread-safety
+    """
+    Bounded store of job statuses, delegating storage to a JobStoreBackend.
+
+    The backend is chosen with $MOVIEREC_JOB_STORE: 'memory' (default) keeps
+    jobs in this process, 'sqlite' shares them between server processes
+    through the database at $MOVIEREC_JOB_DB, which multi-worker deployments
+    need. Finished jobs expire `ttl_seconds` after completion (read as missing,
+    removed by a background sweeper), and the least recently used job is evicted
+    once `max_jobs` are held. Results are stored as the algorithm returned
+    them, with their titles and years.
+    """
+    max_jobs = int(os.environ.get('MOVIEREC_MAX_JOBS', 10000))
+    ttl_seconds = float(os.environ.get('MOVIEREC_JOB_TTL', 600))
+    sweep_interval = 60.0
+    _backend: Optional[JobStoreBackend] = None
+    _sweeper: Optional[asyncio.Task] = None
+    _watchers: Dict[str, Set[asyncio.Event]] = {}
+    watch_interval = 1.0
+    _evicted = 0
+    _expired = 0
+
+    @classmethod
+    def configure(cls, max_jobs: int = None, ttl_seconds: float = None, backend: str = None, path: str = None):
+        """Set the bounds and the backend. Changing the backend or `path` starts from a new store."""
+        if max_jobs is not None:
+            cls.max_jobs = max_jobs
+            if cls._backend is not None:
+                cls._backend.max_jobs = max_jobs
+        if ttl_seconds is not None:
+            cls.ttl_seconds = ttl_seconds
+        if backend is not None or path is not None:
+            cls._backend = cls._create_backend(backend, path)
+
+    @classmethod
+    def _create_backend(cls, backend: str = None, path: str = None) -> JobStoreBackend:
+        backend = backend or os.environ.get('MOVIEREC_JOB_STORE', InMemoryJobBackend.name)
+        if backend not in JOB_STORE_BACKENDS:
+            raise ValueError(f"Unknown job store '{backend}', expected one of {list(JOB_STORE_BACKENDS)}")
+        if backend == SqliteJobBackend.name:
+            return SqliteJobBackend(cls.max_jobs, path or os.environ.get('MOVIEREC_JOB_DB'))
+        return JOB_STORE_BACKENDS[backend](cls.max_jobs)
+
+    @classmethod
+    def backend(cls) -> JobStoreBackend:
+        if cls._backend is None:
+            cls._backend = cls._create_backend()
+        return cls._backend
+
+    @classmethod
+    async def _call(cls, method: str, *args):
+        """Call a backend method, on a worker thread when the backend can block."""
+        backend = cls.backend()
+        if backend.blocking:
+            return await asyncio.to_thread(getattr(backend, method), *args)
+        return getattr(backend, method)(*args)
+
+    @classmethod
+    def _notify(cls, job_id: str):
+        for event in cls._watchers.get(job_id, ()):
+            event.set()
 
     @classmethod
     async def create_job(cls, job_id: str):
-        async with cls._lock:
-            cls._jobs[job_id] = JobStatus(status="pending")
+        cls._evicted += await cls._call('put', job_id, StoredJob("pending"))
+        cls._notify(job_id)
 
     @classmethod
     async def update_job(cls, job_id: str, status: JobStatus):
-        async with cls._lock:
-            cls._jobs[job_id] = status
+        job = StoredJob(status.status, status.results, status.error)
+        if status.status in FINISHED_STATUSES:
+            job.finished_at = time.time()
+        # A late progress message does not overwrite a finished job
+        cls._evicted += await cls._call('put', job_id, job)
+        cls._notify(job_id)
 
     @classmethod
     async def get_job(cls, job_id: str) -> Optional[JobStatus]:
-        async with cls._lock:
-            return cls._jobs.get(job_id)
\ No newline at end of file
+        job = await cls._call('get', job_id)
+        if job is None:
+            return None
+        if job.finished_at is not None and time.time() - job.finished_at > cls.ttl_seconds:
+            # Expired, the sweeper removes it; a status read stays a plain read
+            return None
+
+        results = list(job.results) if job.results is not None else None
+        return JobStatus(status=job.status, results=results, error=job.error)
+
+    @classmethod
+    async def watch(cls, job_id: str) -> AsyncIterator[Optional[JobStatus]]:
+        """
+        Yield the status of a job every time it changes, ending after the job
+        finishes, or with None when the job is unknown or expired.
+
+        Updates made by this process wake the watcher right away. Updates
+        made by other processes (shared backends) are picked up by re-reading
+        the job every `watch_interval` seconds.
+        """
+        event = asyncio.Event()
+        cls._watchers.setdefault(job_id, set()).add(event)
+        try:
+            last = None
+            while True:
+                # Cleared before reading, so an update landing after the read is not missed
+                event.clear()
+                job = await cls._call('get', job_id)
+                if job is None:
+                    yield None
+                    return
+                if (job.status, job.error) != last:
+                    last = (job.status, job.error)
+                    status = await cls.get_job(job_id)
+                    yield status
+                    if status is None or job.finished_at is not None:
+                        return
+                try:
+                    await asyncio.wait_for(event.wait(), cls.watch_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            watchers = cls._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(event)
+                if not watchers:
+                    del cls._watchers[job_id]
+
+    @classmethod
+    async def sweep(cls) -> int:
+        """Drop every expired job, returns how many were removed."""
+        removed = await cls._call('delete_finished_before', time.time() - cls.ttl_seconds)
+        cls._expired += removed
+        return removed
+
+    @classmethod
+    def start_sweeper(cls):
+        async def sweep_forever():
+            while True:
+                await asyncio.sleep(cls.sweep_interval)
+                try:
+                    removed = await cls.sweep()
+                    if removed:
+                        logger.info(f'Swept {removed} expired jobs')
+                except Exception:
+                    logger.exception('Job sweep failed')
+
+        if cls._sweeper is None or cls._sweeper.done():
+            cls._sweeper = asyncio.create_task(sweep_forever())
+
+    @classmethod
+    def stop_sweeper(cls):
+        if cls._sweeper is not None:
+            cls._sweeper.cancel()
+            cls._sweeper = None
+
+    @classmethod
+    async def stats(cls) -> dict:
+        """Gauges of the store: live jobs by state, approximate memory, evictions of this process."""
+        return {
+            'backend': cls.backend().name,
+            **await cls._call('stats'),
+            'max_jobs': cls.max_jobs,
+            'ttl_seconds': cls.ttl_seconds,
+            'evicted_total': cls._evicted,
+            'expired_total': cls._expired,
+        }
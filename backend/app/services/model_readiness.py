@@ -0,0 +1,164 @@
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+PENDING, LOADING, READY, FAILED = 'pending', 'loading', 'ready', 'failed'
+
+
+class ComponentState:
+    __slots__ = ('status', 'error', 'started_at', 'seconds')
+
+    def __init__(self):
+        self.status = PENDING
+        self.error = None
+        self.started_at = None
+        self.seconds = None
+
+
+class ModelReadiness:
+    """
+    Load state of the model components and of the algorithms built on them.
+
+    Components are marked by the threads loading them. An algorithm is ready
+    once all the components it requires are, and failed as soon as one of
+    them failed. Coroutines block in `wait`, woken through the event loop
+    given to `attach` whenever a component changes state.
+    """
+    _components: Dict[str, ComponentState] = {}
+    _requirements: Dict[Hashable, tuple] = {}
+    _lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _changed: Optional[asyncio.Event] = None
+
+    @classmethod
+    def configure(cls, requirements: Dict[Hashable, Sequence[str]]):
+        """Declare the components every algorithm requires, components no longer required are dropped."""
+        with cls._lock:
+            cls._requirements = {key: tuple(names) for key, names in requirements.items()}
+            cls._components = {name: cls._components.get(name, ComponentState())
+                               for names in cls._requirements.values() for name in names}
+
+    @classmethod
+    def attach(cls, loop: asyncio.AbstractEventLoop):
+        cls._loop = loop
+        cls._changed = asyncio.Event()
+
+    @classmethod
+    def _mark(cls, name: str, status: str, error: str = None):
+        with cls._lock:
+            state = cls._components.setdefault(name, ComponentState())
+            if status == LOADING:
+                state.started_at = time.time()
+            elif state.started_at is not None:
+                state.seconds = time.time() - state.started_at
+            state.status, state.error = status, error
+        if cls._loop is not None:
+            try:
+                cls._loop.call_soon_threadsafe(cls._notify)
+            except RuntimeError:
+                pass  # Loop closed, nobody is waiting
+
+    @classmethod
+    def _notify(cls):
+        # Wake every waiter, the next changes go to a fresh event
+        cls._changed.set()
+        cls._changed = asyncio.Event()
+
+    @classmethod
+    @contextmanager
+    def loading(cls, name: str):
+        """Mark `name` loading for the duration of the block, then ready, or failed if it raised."""
+        cls._mark(name, LOADING)
+        try:
+            yield
+        except Exception as e:
+            logger.exception(f'Loading {name} failed')
+            cls._mark(name, FAILED, f'{type(e).__name__}: {e}')
+            raise
+        cls._mark(name, READY)
+
+    @classmethod
+    def mark_loading(cls, name: str):
+        cls._mark(name, LOADING)
+
+    @classmethod
+    def mark_ready(cls, name: str):
+        cls._mark(name, READY)
+
+    @classmethod
+    def mark_failed(cls, name: str, error: str):
+        cls._mark(name, FAILED, error)
+
+    @classmethod
+    def component_status(cls, name: str) -> str:
+        with cls._lock:
+            state = cls._components.get(name)
+            return state.status if state is not None else PENDING
+
+    @classmethod
+    def status(cls, key: Hashable) -> str:
+        with cls._lock:
+            statuses = [cls._components[name].status for name in cls._requirements[key]]
+        if FAILED in statuses:
+            return FAILED
+        if all(status == READY for status in statuses):
+            return READY
+        return LOADING if any(status != PENDING for status in statuses) else PENDING
+
+    @classmethod
+    def is_ready(cls, key: Hashable) -> bool:
+        return cls.status(key) == READY
+
+    @classmethod
+    def error(cls, key: Hashable) -> Optional[str]:
+        """Error of the first failed component `key` requires."""
+        with cls._lock:
+            for name in cls._requirements[key]:
+                if cls._components[name].status == FAILED:
+                    return f'{name}: {cls._components[name].error}'
+        return None
+
+    @classmethod
+    async def wait(cls, key: Hashable, timeout: float = None):
+        """
+        Return once `key` is ready. Raises RuntimeError if one of its
+        components failed, asyncio.TimeoutError after `timeout` seconds.
+        """
+        if cls._loop is None:
+            cls.attach(asyncio.get_running_loop())
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            # Taken before the check, so a change right after it still wakes us
+            changed = cls._changed
+            status = cls.status(key)
+            if status == READY:
+                return
+            if status == FAILED:
+                raise RuntimeError(f"{getattr(key, 'value', key)} is unavailable, {cls.error(key)}")
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.wait_for(changed.wait(), remaining)
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        algorithms = {getattr(key, 'value', key): cls.status(key) for key in cls._requirements}
+        with cls._lock:
+            components = {
+                name: {
+                    'status': state.status,
+                    'seconds': round(state.seconds, 4) if state.seconds is not None else None,
+                    'error': state.error,
+                }
+                for name, state in cls._components.items()
+            }
+        return {
+            'ready': all(status == READY for status in algorithms.values()),
+            'algorithms': algorithms,
+            'components': components,
+        }
@@ -0,0 +1,88 @@
+import time
+import threading
+import numpy as np
+from scipy.sparse import issparse
+from typing import Any, Dict, Optional
+
+
+def estimate_nbytes(obj) -> int:
+    """Approximate memory held by an array, a sparse matrix or the array attributes of an object."""
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if issparse(obj):
+        return sum(getattr(obj, name).nbytes for name in ('data', 'indices', 'indptr') if hasattr(obj, name))
+    if hasattr(obj, '__dict__'):
+        return sum(estimate_nbytes(value) for value in vars(obj).values()
+                   if isinstance(value, np.ndarray) or issparse(value))
+    return 0
+
+
+class ModelEntry:
+    def __init__(self, model, data=None, fit_seconds: float = 0.0):
+        self.model = model
+        self.data = data
+        self.fit_seconds = fit_seconds
+        self.fit_count = 0
+        self.fitted_at = None
+        self.nbytes = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide owner of the fitted models used on the request path.
+
+    Indexes are fitted once at startup through `fit` (or registered prebuilt
+    through `register`) and requests only query them, passing their own
+    parameters (such as the number of neighbors) at query time. `stats`
+    reports fit time, fit count and memory so refits are easy to spot.
+    """
+    _entries: Dict[str, ModelEntry] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def fit(cls, name: str, model, data) -> Any:
+        """Fit `model` on `data` and register it under `name`."""
+        start = time.time()
+        model.fit(data)
+        entry = cls._register(name, model, data, time.time() - start)
+        return entry.model
+
+    @classmethod
+    def register(cls, name: str, model, build_seconds: float = 0.0) -> Any:
+        """Register an already built model (e.g. loaded from an artifact)."""
+        return cls._register(name, model, None, build_seconds).model
+
+    @classmethod
+    def _register(cls, name, model, data, seconds) -> ModelEntry:
+        with cls._lock:
+            previous = cls._entries.get(name)
+            entry = ModelEntry(model, data, seconds)
+            entry.fit_count = previous.fit_count + 1 if previous is not None else 1
+            entry.fitted_at = time.time()
+            entry.nbytes = estimate_nbytes(model) or estimate_nbytes(data)
+            cls._entries[name] = entry
+            return entry
+
+    @classmethod
+    def get(cls, name: str) -> Optional[Any]:
+        entry = cls._entries.get(name)
+        return entry.model if entry is not None else None
+
+    @classmethod
+    def training_data(cls, name: str) -> Optional[Any]:
+        """Data the model was fitted on, e.g. to look up query vectors by row."""
+        entry = cls._entries.get(name)
+        return entry.data if entry is not None else None
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                'type': type(entry.model).__name__,
+                'fit_seconds': round(entry.fit_seconds, 4),
+                'fit_count': entry.fit_count,
+                'fitted_at': entry.fitted_at,
+                'memory_bytes': entry.nbytes,
+            }
+            for name, entry in cls._entries.items()
+        }
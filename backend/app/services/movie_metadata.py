@@ -0,0 +1,48 @@
+import logging
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
+from app.models.recommendation import MovieRecommendation
+
+logger = logging.getLogger(__name__)
+
+
+class MovieMetadata:
+    """
+    Columnar movie metadata with a hash index on the IMDb id.
+
+    Built once at startup from the movie names table. A batch of ids is
+    resolved to row positions with one hash lookup and the fields are
+    gathered with array indexing, instead of scanning the table per id.
+    """
+
+    def __init__(self, movie_names: pd.DataFrame):
+        # The first row wins for duplicated ids, as the previous per-id lookups did
+        movie_names = movie_names.drop_duplicates(subset='imdb_id', keep='first')
+
+        self.imdb_ids = movie_names['imdb_id'].to_numpy()
+        self.titles = movie_names['title'].to_numpy()
+        self.years = pd.to_numeric(movie_names['year'], errors='coerce').to_numpy(dtype=np.float64)
+        self.index = pd.Index(self.imdb_ids)
+
+    def __len__(self):
+        return len(self.imdb_ids)
+
+    def positions(self, imdb_ids: Sequence[str]) -> np.ndarray:
+        """Row positions of `imdb_ids`, -1 for unknown ids."""
+        return self.index.get_indexer(pd.Index(imdb_ids, dtype=object))
+
+    def hydrate(self, imdb_ids: Sequence[str]) -> List[MovieRecommendation]:
+        """MovieRecommendation objects for `imdb_ids`, in order; unknown ids are skipped."""
+        if len(imdb_ids) == 0:
+            return []
+
+        positions = self.positions(imdb_ids)
+        if (positions < 0).any():
+            logger.warning(f'No metadata for {list(np.asarray(imdb_ids, dtype=object)[positions < 0])}')
+            positions = positions[positions >= 0]
+
+        titles = self.titles[positions]
+        years = self.years[positions]
+        return [MovieRecommendation(id=imdb_id, title=title, year=int(year) if year > 0 else None)
+                for imdb_id, title, year in zip(self.imdb_ids[positions], titles, years)]
@@ -0,0 +1,128 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class RatingStats:
+    """
+    Dense per-user and per-movie rating statistics indexed by sparse id.
+
+    Built once at startup (or loaded from a persisted artifact) so that the
+    kNN recommenders can read means and standard deviations by position
+    instead of running a groupby over the whole ratings table per request.
+    Standard deviations follow the pandas convention (ddof=1, NaN when an
+    entity has fewer than two ratings). `source` identifies the ratings the
+    statistics were computed from, so a persisted artifact can be checked.
+    """
+
+    _fields = ('user_mean', 'user_std', 'user_count', 'user_sum',
+               'movie_mean', 'movie_std', 'movie_count', 'movie_sum')
+
+    def __init__(self, user_mean, user_std, user_count, user_sum,
+                 movie_mean, movie_std, movie_count, movie_sum, global_mean, source=None):
+        self.user_mean = user_mean
+        self.user_std = user_std
+        self.user_count = user_count
+        self.user_sum = user_sum
+        self.movie_mean = movie_mean
+        self.movie_std = movie_std
+        self.movie_count = movie_count
+        self.movie_sum = movie_sum
+        self.global_mean = float(global_mean)
+        self.source = source
+
+    @staticmethod
+    def _aggregate(ids, ratings, size):
+        count = np.bincount(ids, minlength=size).astype(np.float64)
+        total = np.bincount(ids, weights=ratings, minlength=size)
+        squares = np.bincount(ids, weights=ratings * ratings, minlength=size)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            var = (squares - count * mean * mean) / (count - 1)
+        mean[count == 0] = np.nan
+        var[count < 2] = np.nan
+        std = np.sqrt(np.clip(var, 0, None))
+
+        return (mean.astype(np.float32), std.astype(np.float32),
+                count.astype(np.float32), total.astype(np.float32))
+
+    @classmethod
+    def from_ratings(cls, df_ratings, n_users=None, n_movies=None, source=None):
+        """
+        Compute the statistics from a ratings DataFrame with columns
+        'sparse_user_id', 'sparse_movie_id' and 'rating'.
+
+        Args:
+            df_ratings (pd.DataFrame): Ratings table
+            n_users (int, optional): Number of rows of the sparse matrix
+            n_movies (int, optional): Number of columns of the sparse matrix
+            source (str, optional): Version of the ratings table, see `load_or_build`
+        """
+        start = time.time()
+        users = df_ratings['sparse_user_id'].to_numpy(dtype=np.int64)
+        movies = df_ratings['sparse_movie_id'].to_numpy(dtype=np.int64)
+        ratings = df_ratings['rating'].to_numpy(dtype=np.float64)
+
+        n_users = n_users if n_users is not None else int(users.max()) + 1
+        n_movies = n_movies if n_movies is not None else int(movies.max()) + 1
+
+        stats = cls(*cls._aggregate(users, ratings, n_users),
+                    *cls._aggregate(movies, ratings, n_movies),
+                    global_mean=ratings.mean(), source=source)
+        logger.info(f'Rating statistics computed in {time.time() - start:.2f}s '
+                    f'({n_users} users, {n_movies} movies)')
+        return stats
+
+    def save(self, filepath: str = './Data/rating_stats.npz'):
+        """
+        Persist the statistics as an uncompressed npz artifact. The file is
+        written aside and renamed, so processes loading concurrently never
+        read a partial one.
+        """
+        tmp_path = f'{filepath}.{os.getpid()}.{threading.get_ident()}.tmp.npz'
+        try:
+            np.savez(tmp_path, global_mean=np.float64(self.global_mean), source=np.str_(self.source or ''),
+                     **{name: getattr(self, name) for name in self._fields})
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, filepath: str = './Data/rating_stats.npz'):
+        """Load statistics previously written with `save`."""
+        with np.load(filepath) as artifact:
+            # Artifacts written before the source was recorded have none
+            source = (str(artifact['source']) or None) if 'source' in artifact.files else None
+            return cls(**{name: artifact[name] for name in cls._fields},
+                       global_mean=artifact['global_mean'], source=source)
+
+    @classmethod
+    def load_or_build(cls, filepath, df_ratings, n_users=None, n_movies=None, source=None):
+        """
+        Load the persisted artifact when it matches the ratings matrix shape
+        and was computed from the same `source` (e.g. a digest of the ratings
+        file's size and modification time). Otherwise compute the statistics
+        from the ratings table and persist them for the next start.
+        """
+        if os.path.exists(filepath):
+            stats = cls.load(filepath)
+            if ((n_users is None or len(stats.user_mean) == n_users) and
+                    (n_movies is None or len(stats.movie_mean) == n_movies) and
+                    (source is None or stats.source == source)):
+                logger.info(f'Loaded rating statistics from {filepath}')
+                return stats
+            logger.warning(f'Ignoring stale rating statistics at {filepath}')
+
+        stats = cls.from_ratings(df_ratings, n_users, n_movies, source=source)
+        try:
+            stats.save(filepath)
+        except OSError as e:
+            logger.warning(f'Could not persist rating statistics to {filepath}: {e}')
+        return stats
@@ -1,15 +1,30 @@
+import asyncio
 from asyncio.log import logger
-from typing import List
+from typing import Awaitable, List
 from app.models.recommendation import AlgorithmType, Rating, MovieRecommendation, JobStatus
 from app.services.job_stores import JobStore
-import pandas as pd
+from app.services.rating_stats import RatingStats
+from app.services.model_registry import ModelRegistry
+from app.services.movie_metadata import MovieMetadata
+from app.services.title_search import TitleSearchIndex
+from app.services.executor import RecommendationExecutor
+from app.services.cost_model import CostModel
+from app.services.result_cache import ResultCache, data_version, key_seed, request_key
+from app.services.id_translation import IdTranslation
+from app.services.columnar_table import read_table, table_source
+from app.services.model_readiness import FAILED, READY, ModelReadiness
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import scipy
 from sklearn.neighbors import NearestNeighbors
-from sklearn.metrics.pairwise import cosine_similarity
 from app.models.SparseSVDRecommender import SparseSVDRecommender
+from app.models.item_neighbors import ItemNeighborTable
+from app.models.ann import RandomProjectionLSH
+from app.models.content_based import EmbeddingIndex, top_n_indices
 from fastapi import FastAPI
 import os
+import time
+import threading
 from thefuzz import fuzz, process
 from app.models.kNN import *
 from sklearn.neighbors import NearestNeighbors
@@ -22,128 +37,282 @@ data_folder = './app/'
 movie_metadata_path = data_folder + 'movie.metadata.tsv'
 
 df = None
-movie_mapping = None
-reverse_movie_mapping = None
+matrix_ids = None
 user_mapping = None
 sparse_matrix = None
 movie_names = None
+movie_metadata = None
+title_index = None
 recommender = None
 df_ratings = None
-knn_user = NearestNeighbors(metric='cosine', algorithm='brute', n_jobs=-1, n_neighbors=20)
-knn_item = NearestNeighbors(metric='cosine', algorithm='brute', n_jobs=-1, n_neighbors=20)
+rating_stats = None
 
 
-encodings, movie_mapping_SAE, reverse_movie_mapping_SAE = None, None, None
+content_index, content_ids = None, None
 
 app = FastAPI()
 
-def formating_imdbId(x) :
-    x= round(x)
-    x_str= str(x)
-    while len(x_str) < 7 :
-        x_str= '0' + x_str
-    return 'tt' + x_str
-
-def generate_sparse_vector_from_ratings(list_of_imdbid_and_rating, total_nbr_of_movies) :
-    small_df= pd.DataFrame(data= list_of_imdbid_and_rating, columns= ['imdbId', 'rating'])
-    ratings= np.array(small_df['rating'].values, dtype= float) - 2.25
-    movie_ids= small_df['imdbId'].map(movie_mapping).values
-    imdb_ids= small_df['imdbId']
-    return scipy.sparse.csr_matrix((ratings, (np.zeros(len(movie_ids)), movie_ids)), shape= (1, total_nbr_of_movies)), imdb_ids
-
 def weighted_rating(R, v, m, C):
     # Calculation based on the IMDB formula
     return (v/(v+m) * R) + (m/(m+v) * C)
 
-def inverse_imdb_transform(imdb):
-    return int(imdb[2:])
 
 
+def _load_metadata():
+    global movie_names, movie_metadata, title_index
+    movie_names = read_table('./Data/movie_names_dates_imdb', './Data/movie_names_dates_imdb.csv')
+    movie_metadata = MovieMetadata(movie_names)
+    title_index = TitleSearchIndex(movie_names['title'])
 
-def init_data(app):
-    @app.on_event("startup")
-    async def load_datasets():
-        global user_mapping, movie_mapping, df_ratings, sparse_matrix, movie_names, recommender, reverse_movie_mapping, knn_user
-        # Load datasets once when the server starts
-        
-        logger.info(os.getcwd())
-        movie_names = pd.read_csv('./Data/movie_names_dates_imdb.csv', index_col=0)
 
-        # load the data
-        
-        logger.info('Loading ratings')
-        df_ratings = pd.read_csv('./Data/df_ratings_knn.csv', index_col=0)
-        logger.info('Loading sparse matrix')
-        sparse_matrix = scipy.sparse.load_npz("./Data/sparse_ratings_matrix.npz")
-        
-        logger.info('Fitting kNN to sparse user')
-        knn_user.fit(sparse_matrix) 
-        
-        logger.info('Fitting kNN to sparse item')
-        knn_item.fit(sparse_matrix.T) 
-        
-        movie_mapping = np.load('./Data/movie_mapping.npy', allow_pickle=True).item()
-        reverse_movie_mapping = np.load('./Data/reverse_movie_mapping.npy', allow_pickle=True).item()
+def _load_matrix_ids():
+    global matrix_ids
+    # IMDb id <-> ratings matrix column, shared by the kNN and SVD models
+    matrix_ids = IdTranslation.load_or_convert('./Data/movie_ids.npz', './Data/movie_mapping.npy',
+                                               './Data/reverse_movie_mapping.npy')
 
-    
 
-        # ------------------------------ SVD ------------------------------------ # 
+# Table directory and CSV fallback of the ratings
+RATINGS_TABLE = ('./Data/df_ratings_knn', './Data/df_ratings_knn.csv')
 
-        logger.info('Loading SparseSVD')
-        recommender = SparseSVDRecommender()
-    
-        logger.info('Loading model for SVD')
-        recommender.load_model('Data/sample_svd_model14.joblib')
 
-        # -------------------------------- CONTENT BASED ------------------------  #
-        global encodings, movie_mapping_SAE, reverse_movie_mapping_SAE
+def _load_ratings():
+    global df_ratings, sparse_matrix, rating_stats
+    logger.info('Loading ratings')
+    df_ratings = read_table(*RATINGS_TABLE)
+    logger.info('Loading sparse matrix')
+    sparse_matrix = scipy.sparse.load_npz("./Data/sparse_ratings_matrix.npz")
 
-        logger.info('Loading Content based values')
+    logger.info('Loading rating statistics')
+    # Persisted statistics are reused while the ratings file they were computed from is unchanged
+    rating_stats = RatingStats.load_or_build('./Data/rating_stats.npz', df_ratings, *sparse_matrix.shape,
+                                             source=data_version(table_source(*RATINGS_TABLE)))
 
-        encodings = np.load('./Data/SAE_embedding.npy', allow_pickle=True)
-        movie_mapping_SAE = np.load('./Data/mapping_SAE.npy', allow_pickle=True).item()
-        reverse_movie_mapping_SAE = np.load('./Data/reverse_mapping_SAE.npy', allow_pickle=True).item()
 
-# ------------------------------------------ ALGO ------------------------------------------------
+# Neighbor indexes are fitted once here, requests pass their own k at query time
+def _fit_knn_user():
+    logger.info('Fitting kNN to sparse user')
+    ModelRegistry.fit('knn_user', NearestNeighbors(metric='cosine', algorithm='brute',
+                                                   n_jobs=RecommendationExecutor.thread_limit or -1),
+                      sparse_matrix)
 
-def get_rec_from_ids(imdb_ids: List[str]):
 
-    return [MovieRecommendation(id=id, 
-                                title=movie_names[movie_names['imdb_id'] == id]['title'].values[0],
-                                year=movie_names[movie_names['imdb_id'] == id]['year'].values[0] 
-                                    if movie_names[movie_names['imdb_id'] == id]['year'].values[0] > 0 
-                                    else None
-                                    ) for id in imdb_ids]
+def _load_user_lsh():
+    start = time.time()
+    try:
+        logger.info('Loading approximate user index')
+        user_lsh = RandomProjectionLSH.load('./Data/user_lsh.npz', sparse_matrix)
+    except (FileNotFoundError, ValueError) as e:
+        logger.warning(f'{e}; building the approximate user index in memory '
+                       '(run `python -m scripts.bench_user_ann --save` to persist it)')
+        user_lsh = RandomProjectionLSH().fit(sparse_matrix)
+    ModelRegistry.register('knn_user_lsh', user_lsh, time.time() - start)
+
+
+def _fit_knn_item():
+    logger.info('Fitting kNN to sparse item')
+    ModelRegistry.fit('knn_item', NearestNeighbors(metric='cosine', algorithm='brute',
+                                                   n_jobs=RecommendationExecutor.thread_limit or -1),
+                      sparse_matrix.T.tocsr())
+
+
+def _load_item_neighbors():
+    start = time.time()
+    if os.path.exists('./Data/item_neighbors.npz'):
+        logger.info('Loading item neighbor table')
+        item_neighbors = ItemNeighborTable.load('./Data/item_neighbors.npz')
+    else:
+        logger.warning('No ./Data/item_neighbors.npz found, building it in memory '
+                       '(run `python -m scripts.build_item_neighbors` to persist it)')
+        item_neighbors = ItemNeighborTable.build(sparse_matrix, n_jobs=RecommendationExecutor.thread_limit)
+    ModelRegistry.register('item_neighbors', item_neighbors, time.time() - start)
+
+
+def _load_svd():
+    global recommender
+    logger.info('Loading SparseSVD')
+    model = SparseSVDRecommender()
+    if os.path.exists('./Data/svd_model/manifest.json'):
+        # Memory-mapped artifact, pages are shared between workers
+        filepath = './Data/svd_model'
+    else:
+        filepath = './Data/sample_svd_model14.joblib'
+    # load_model reports its errors by returning None, the step must fail rather than serve an untrained model
+    if model.load_model(filepath) is None:
+        raise RuntimeError(f"Could not load the SVD model from {filepath}")
+    recommender = model
+
+
+def _load_content():
+    global content_index, content_ids
+    logger.info('Loading Content based values')
+    if os.path.exists('./Data/SAE_embedding/manifest.json'):
+        # Memory-mapped artifact, pages are shared between workers
+        index = EmbeddingIndex.load('./Data/SAE_embedding')
+    else:
+        index = EmbeddingIndex(np.load('./Data/SAE_embedding.npy', allow_pickle=True))
+    logger.info(f'Content embeddings: {index.n_movies} movies, {index.precision}')
+    content_ids = IdTranslation.load_or_convert('./Data/SAE_ids.npz', './Data/mapping_SAE.npy',
+                                                './Data/reverse_mapping_SAE.npy')
+    content_index = index
+
+
+# Loading steps and the steps they need, every step listed after the ones it needs
+MODEL_LOADERS = {
+    'metadata': (_load_metadata, ()),
+    'matrix_ids': (_load_matrix_ids, ()),
+    'ratings': (_load_ratings, ()),
+    'knn_user': (_fit_knn_user, ('ratings',)),
+    'knn_user_lsh': (_load_user_lsh, ('ratings',)),
+    'knn_item': (_fit_knn_item, ('ratings',)),
+    'item_neighbors': (_load_item_neighbors, ('ratings',)),
+    'svd': (_load_svd, ()),
+    'content': (_load_content, ()),
+}
+
+# Loading steps every algorithm needs before it can serve requests
+ALGORITHM_REQUIREMENTS = {
+    AlgorithmType.KNN_USER: ('metadata', 'matrix_ids', 'ratings', 'knn_user', 'knn_user_lsh'),
+    AlgorithmType.KNN_ITEM: ('metadata', 'matrix_ids', 'ratings', 'knn_item', 'item_neighbors'),
+    AlgorithmType.CONTENT_BASED: ('metadata', 'content'),
+    AlgorithmType.SVD: ('metadata', 'matrix_ids', 'svd'),
+}
+ModelReadiness.configure(ALGORITHM_REQUIREMENTS)
+
+
+def loading_steps(algorithms) -> List[str]:
+    """Steps `algorithms` need, with the steps those need in turn, in MODEL_LOADERS order."""
+    needed = set()
+    pending = [step for algorithm in algorithms for step in ALGORITHM_REQUIREMENTS[algorithm]]
+    while pending:
+        step = pending.pop()
+        if step not in needed:
+            needed.add(step)
+            pending.extend(MODEL_LOADERS[step][1])
+    return [step for step in MODEL_LOADERS if step in needed]
+
+
+def load_models(algorithms=None):
+    """
+    Load the model artifacts of `algorithms`, of every algorithm by default.
+    Steps that do not need each other run concurrently on threads, and each
+    algorithm becomes ready in ModelReadiness as soon as its steps are done.
+    Raises once all steps ended if any of them failed.
+    """
+    logger.info(os.getcwd())
+
+    steps = loading_steps(algorithms) if algorithms is not None else list(MODEL_LOADERS)
+    futures = {}
+
+    def load(name):
+        loader, needed = MODEL_LOADERS[name]
+        for dependency in needed:
+            if futures[dependency].exception() is not None:
+                ModelReadiness.mark_failed(name, f"needs {dependency}, which failed")
+                raise RuntimeError(f"{name} needs {dependency}, which failed")
+        with ModelReadiness.loading(name):
+            loader()
+
+    # One thread per step, a step waiting on another never holds back a runnable one
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix='load') as pool:
+        for name in steps:
+            futures[name] = pool.submit(load, name)
+    failed = [name for name, future in futures.items() if future.exception() is not None]
+    if failed:
+        raise RuntimeError(f"Failed to load {', '.join(failed)}")
+
+
+def load_available_models(algorithms=None):
+    """
+    load_models for the server and its pool workers: a failed step is
+    logged and leaves the algorithms needing it unavailable, instead of
+    stopping the process.
+    """
+    try:
+        load_models(algorithms)
+    except RuntimeError as e:
+        logger.error(str(e))
+
+
+def load_pool_models():
+    # Initializer of the process pool workers, which only ever run the PROCESS_POOL_ALGORITHMS.
+    # The status of its steps goes back to the server, see record_pool_models
+    load_available_models(PROCESS_POOL_ALGORITHMS)
+    steps = loading_steps(PROCESS_POOL_ALGORITHMS)
+    return {name: state for name, state in ModelReadiness.stats()['components'].items() if name in steps}
+
+
+def pool_step(name: str) -> str:
+    """Readiness component of a loading step done by the process pool workers."""
+    return f'pool:{name}'
+
+
+def record_pool_models(pid: int, statuses: dict, error: str):
+    """
+    Mark the pool algorithms' steps from the report of one process worker.
+    A step is ready once a worker loaded it, and failed as soon as any
+    worker could not, since jobs may reach that worker.
+    """
+    for step in loading_steps(PROCESS_POOL_ALGORITHMS):
+        name = pool_step(step)
+        state = (statuses or {}).get(step)
+        if error is None and state is not None and state['status'] == READY:
+            if ModelReadiness.component_status(name) != FAILED:
+                ModelReadiness.mark_ready(name)
+        else:
+            reason = error or (state['error'] if state is not None else None) or 'not loaded'
+            ModelReadiness.mark_failed(name, f'worker {pid}: {reason}')
 
 
-def recommend_SAE(ratings: List[Rating], fixed_count, min_similarity=0):
-    
-    imdbid = [inverse_imdb_transform(rating.imdb_id) for rating in ratings]
+def init_data(app):
+    @app.on_event("startup")
+    async def load_datasets():
+        # Models load in the background; the server takes requests right away
+        # and every algorithm serves as soon as its own models are ready
+        ModelReadiness.attach(asyncio.get_running_loop())
+        RecommendationExecutor.start(initializer=load_pool_models, on_worker_init=record_pool_models)
+        algorithms, requirements = list(ALGORITHM_REQUIREMENTS), dict(ALGORITHM_REQUIREMENTS)
+        if RecommendationExecutor.uses_processes():
+            # The pool algorithms only run in the workers: this process skips their models,
+            # and they are ready once the workers report theirs loaded
+            algorithms = [algorithm for algorithm in algorithms if algorithm not in PROCESS_POOL_ALGORITHMS]
+            for algorithm in PROCESS_POOL_ALGORITHMS:
+                requirements[algorithm] = tuple(pool_step(step) for step in ALGORITHM_REQUIREMENTS[algorithm])
+        ModelReadiness.configure(requirements)
+        if RecommendationExecutor.uses_processes():
+            for step in loading_steps(PROCESS_POOL_ALGORITHMS):
+                ModelReadiness.mark_loading(pool_step(step))
+        threading.Thread(target=load_available_models, args=(algorithms,), name='load-models', daemon=True).start()
+        JobStore.start_sweeper()
+
+    @app.on_event("shutdown")
+    async def stop_executor():
+        JobStore.stop_sweeper()
+        RecommendationExecutor.shutdown()
 
-    similarities = np.zeros(encodings.shape[0])
-    for movie in imdbid:
+# ------------------------------------------ ALGO ------------------------------------------------
 
-        id = movie_mapping_SAE[movie]
+def get_rec_from_ids(imdb_ids: List[str]):
 
-        embedding = encodings[id].reshape(1,-1)
+    return movie_metadata.hydrate(imdb_ids)
 
-        similarities += cosine_similarity(encodings, embedding).ravel()
 
-        similarities[id] = float('-inf')
+def recommend_SAE(ratings: List[Rating], fixed_count, min_similarity=0):
+    
+    rated_rows = content_ids.indices([rating.imdb_id for rating in ratings], strict=True)
 
+    # All rated movies are scored in one product against the normalized embeddings
+    similarities = content_index.similarities(rated_rows)
+    similarities[rated_rows] = float('-inf')
 
     if min_similarity > 0:
         similarities[similarities < min_similarity] = float('-inf')
             
     # Get top N recommendations
-    similar_indices = np.argsort(similarities)[::-1][:fixed_count]
+    similar_indices = top_n_indices(similarities, fixed_count)
     
     # Convert back to IMDb IDs
-    recommendations = [
-        formating_imdbId(reverse_movie_mapping_SAE[rec_idx])
-        for rec_idx in similar_indices
-        if similarities[rec_idx] != float('-inf')
-    ]
+    recommendations = content_ids.imdb_ids(similar_indices[similarities[similar_indices] != float('-inf')])
     print(recommendations)
     results = get_rec_from_ids(recommendations)    
     print(results)
@@ -151,114 +320,157 @@ def recommend_SAE(ratings: List[Rating], fixed_count, min_similarity=0):
     return results
 
 
-async def recommend_kNN_item_based(ratings: List[Rating], fixed_count, k, minCommonItems, jobid=None):
-
-    try:
-        # Update status to running
-        await JobStore.update_job(jobid, JobStatus(status="running"))
-        
-        # Run CPU-intensive operations in a thread
-        loop = asyncio.get_event_loop()
-        
-        # Wrap your CPU-intensive operations in a function
-        def compute_recommendations():
-            print('testtt1')
-            means_by_movie = df_ratings.groupby('sparse_movie_id')['rating'].mean()
-            print('testtt2')
-            std_by_movie = df_ratings.groupby('sparse_movie_id')['rating'].std()
-            ratings_new_user = [[str(inverse_imdb_transform(rating.imdb_id)), rating.rating] for rating in ratings]
-            print('testtt3')
-            knn_item = NearestNeighbors(metric='cosine', algorithm='brute', n_jobs=-1, n_neighbors=k)
-            knn_item.fit(sparse_matrix.T)
-            return means_by_movie, std_by_movie, ratings_new_user, knn_item
-
-        # Run CPU-intensive part in thread
-        means_by_movie, std_by_movie, ratings_new_user, knn_item = await loop.run_in_executor(
-            None,
-            compute_recommendations
-        )
-
-        # Now run your async function
-        recommendations, _ = await reco_item_based_new_user(
-            ratings_new_user,
-            movie_mapping,
-            knn_item,
-            means_by_movie,
-            std_by_movie,
-            sparse_matrix,
-            number_of_reco=5,
-            number_of_movies_for_reco=minCommonItems,
-            jobid=jobid
-        )
-
-        print('testtt4')
-        
-        # Process results in thread if needed
-        def process_results():
-            imdb_ids = [formating_imdbId(int(reverse_movie_mapping[rec[0]])) for rec in recommendations[:fixed_count]]
-            print(imdb_ids)
-            return get_rec_from_ids(imdb_ids)
-
-        results = await loop.run_in_executor(None, process_results)
-        
-        # Update job status with results
-        await JobStore.update_job(jobid, JobStatus(status="completed", result=results))
-        
-        return results
-    except Exception as e:
-        logger.exception("Error in generate_recommendations")
-        await JobStore.update_job(jobid, JobStatus(status="failed", error=str(e)))
-        raise
-
-
-
-def recommend_kNN_user_based(ratings: List[Rating], fixed_count, k, minCommonUsers, maxMovies):
+def recommend_SAE_batch(users: List[List[Rating]], fixed_count, min_similarity=0, chunk_size=256):
+    """
+    Yield the content based recommendations of every ratings list, in order.
+    The profiles of a chunk of users go through one embeddings product; a
+    user whose ratings cannot be scored yields the exception instead.
+    """
+    for start in range(0, len(users), chunk_size):
+        chunk = users[start:start + chunk_size]
+        rated_rows, errors = [], {}
+        for position, ratings in enumerate(chunk):
+            try:
+                rated_rows.append(content_ids.indices([rating.imdb_id for rating in ratings], strict=True))
+            except (KeyError, ValueError) as e:
+                rated_rows.append(np.empty(0, dtype=np.int64))
+                errors[position] = e
+
+        # Profiles are sums of the rated movies' normalized embeddings, built as indicator @ vectors
+        union = np.unique(np.concatenate(rated_rows))
+        lengths = [len(rows) for rows in rated_rows]
+        indicator = scipy.sparse.csr_matrix(
+            (np.ones(sum(lengths), dtype=np.float32),
+             (np.repeat(np.arange(len(chunk)), lengths),
+              np.searchsorted(union, np.concatenate(rated_rows)))),
+            shape=(len(chunk), len(union)))
+        profiles = np.asarray(indicator @ content_index.vectors(union)).T
+        scores = content_index.scores(profiles)
+
+        for position in range(len(chunk)):
+            if position in errors:
+                yield errors[position]
+                continue
+            similarities = scores[:, position].copy()
+            similarities[rated_rows[position]] = float('-inf')
+            if min_similarity > 0:
+                similarities[similarities < min_similarity] = float('-inf')
+
+            similar_indices = top_n_indices(similarities, fixed_count)
+            yield get_rec_from_ids(content_ids.imdb_ids(
+                similar_indices[similarities[similar_indices] != float('-inf')]))
+
+
+def recommend_kNN_item_based(ratings: List[Rating], fixed_count, k, minCommonItems, progress=None):
+
+    movie_ids, values = matrix_ids.ratings(ratings, strict=True)
+
+    # Neighbors come from the precomputed table, or the shared pre-fitted
+    # knn when k is wider than the table; nothing is fitted per request
+    recommendations, _ = reco_item_based_new_user(
+        movie_ids,
+        values,
+        ModelRegistry.get('item_neighbors'),
+        rating_stats.movie_mean,
+        rating_stats.movie_std,
+        number_of_reco=5,
+        number_of_movies_for_reco=minCommonItems,
+        k=k,
+        knn=ModelRegistry.get('knn_item'),
+        movie_vectors=ModelRegistry.training_data('knn_item'),
+        progress=progress
+    )
+
+    imdb_ids = matrix_ids.imdb_ids([rec[0] for rec in recommendations[:fixed_count]])
+    print(imdb_ids)
+    return get_rec_from_ids(imdb_ids)
+
+
+USER_NEIGHBOR_INDEXES = {'brute': 'knn_user', 'lsh': 'knn_user_lsh'}
+
+def recommend_kNN_user_based(ratings: List[Rating], fixed_count, k, minCommonUsers, maxMovies, neighborIndex='brute',
+                             seed=None):
     
-    ratings_new_user = [[str(inverse_imdb_transform(rating.imdb_id)), rating.rating] for rating in ratings]
+    movie_ids, values = matrix_ids.ratings(ratings, strict=True)
     
-    means_by_user = df_ratings.groupby('sparse_user_id')['rating'].mean()
-    std_by_user = df_ratings.groupby('sparse_user_id')['rating'].std()
-
     recommendations = reco_user_based_new_user(
-        ratings_new_user,
-        movie_mapping,
-        df_ratings,
-        knn_user,
-        means_by_user,
-        std_by_user,
-        sparse_matrix.shape[1],
+        movie_ids,
+        values,
+        sparse_matrix,
+        ModelRegistry.get(USER_NEIGHBOR_INDEXES[neighborIndex]),
+        rating_stats.user_mean,
+        rating_stats.user_std,
+        rating_stats.global_mean,
         num_reco=10,
         number_of_neighbors=k,
         max_number_of_movies=maxMovies,
-        number_of_users=minCommonUsers)
+        number_of_users=minCommonUsers,
+        rng=np.random.default_rng(seed))
 
 
     recommendations = recommendations['mean_centering'][:fixed_count]
-    imdb_ids = [formating_imdbId(int(reverse_movie_mapping[rec[0]])) for rec in recommendations]
+    imdb_ids = matrix_ids.imdb_ids([rec[0] for rec in recommendations])
 
     results = get_rec_from_ids(imdb_ids)
 
     return results
 
-def SVD_recommendation(ratings: List[Rating], fixed_count):
-    
-    ratings = [[str(inverse_imdb_transform(rating.imdb_id)), rating.rating] for rating in ratings]
+def _known_svd_ratings(ratings: List[Rating]):
+    """
+    Sparse movie ids and values of the rated movies the SVD model knows, the
+    others are ignored. Raises ValueError when it knows none of them.
+    """
+    movie_ids, values = matrix_ids.ratings(ratings)
+    known = recommender.item_indices(movie_ids) >= 0
+    if not known.any():
+        raise ValueError("None of the rated movies is known to the SVD model")
+    return movie_ids[known], values[known]
+
 
-    new_ratings_df = pd.DataFrame(ratings, columns=['original_movie_id', 'rating'])
-    new_ratings_df['original_movie_id'] = new_ratings_df['original_movie_id']
+def SVD_recommendation(ratings: List[Rating], fixed_count, fold_in='average'):
 
-    new_ratings_df['sparse_movie_id'] = new_ratings_df['original_movie_id'].map(movie_mapping)
-    ratings_to_pass_df = new_ratings_df.drop(columns=['original_movie_id'])
+    movie_ids, values = _known_svd_ratings(ratings)
 
-    recommendations = recommender.handle_new_user(ratings_to_pass_df, n_items=fixed_count)
+    recommendations = recommender.handle_new_user(movie_ids, values, n_items=fixed_count, method=fold_in)
 
-    imdb_ids = [formating_imdbId(int(reverse_movie_mapping[rec[0]])) for rec in recommendations[:fixed_count]]
+    imdb_ids = matrix_ids.imdb_ids([rec[0] for rec in recommendations[:fixed_count]])
 
     results = get_rec_from_ids(imdb_ids)
 
     return results
 
 
+def SVD_recommendation_batch(users: List[List[Rating]], fixed_count, fold_in='average'):
+    """
+    Yield the SVD recommendations of every ratings list, in order. All users
+    are folded in together and scored with matrix products against the item
+    factors. Unknown movies are ignored, as in SVD_recommendation; a user
+    whose ratings cannot be used yields the exception instead.
+    """
+    if not users:
+        return
+    movie_ids, values, errors = [], [], {}
+    for position, ratings in enumerate(users):
+        try:
+            user_movie_ids, user_values = _known_svd_ratings(ratings)
+        except (KeyError, ValueError) as e:
+            user_movie_ids, user_values = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            errors[position] = e
+        movie_ids.append(user_movie_ids)
+        values.append(user_values)
+
+    rows = np.repeat(np.arange(len(users)), [len(user_movie_ids) for user_movie_ids in movie_ids])
+    items = recommender.item_indices(np.concatenate(movie_ids))
+
+    # Users in error have no ratings, recommend_batch yields an empty list for them
+    for position, recommendations in enumerate(recommender.recommend_batch(
+            rows, items, np.concatenate(values), len(users), n_items=fixed_count, method=fold_in)):
+        if position in errors:
+            yield errors[position]
+            continue
+        yield get_rec_from_ids(matrix_ids.imdb_ids([rec[0] for rec in recommendations]))
+
+
 def content_based_filtering(ratings: List[Rating]) -> List[MovieRecommendation]:
     recommendations = ["tt0073195", "tt0078788"]
     
@@ -272,10 +484,7 @@ def hybrid_recommendations(ratings: List[Rating]) -> List[MovieRecommendation]:
 
 async def check_if_in(job_id: str, movies: List[str]):
     try:
-        isIn = []
-        for movie in movies:
-            if movie in movie_mapping:
-                isIn.append(movie)
+        isIn = [movie for movie, known in zip(movies, matrix_ids.indices(movies) >= 0) if known]
     except Exception as e:
         await JobStore.update_job(job_id, 
                             JobStatus('failed', error=str(e)))
@@ -283,22 +492,18 @@ async def check_if_in(job_id: str, movies: List[str]):
 async def find_movie(query: str, threshold):
     try:
         print('Start job', query, type(query))
-        choices = movie_names['title'] # dict(zip(movie_names['title'], df.index))
-        print(f'Got choices', list(choices.items())[:10])
-        matches = process.extractBests(
-            query,
-            choices,
-            limit=10,
-        )
+        # Fuzzy scoring runs on the n-gram shortlist, off the event loop
+        loop = asyncio.get_event_loop()
+        matches = await loop.run_in_executor(None, title_index.search, query, 10)
         print('Extracted best matches', matches)
 
         if not matches:
-            results = []
-        else:
-            matched_indices = [match[2] for match in matches]
-            result_df = movie_names.loc[matched_indices].copy()
-            result_df['similarity_score'] = [match[1] for match in matches]
-            results = result_df.sort_values('similarity_score', ascending=False)
+            return []
+
+        matched_positions = [match[2] for match in matches]
+        result_df = movie_names.iloc[matched_positions].copy()
+        result_df['similarity_score'] = [match[1] for match in matches]
+        results = result_df.sort_values('similarity_score', ascending=False, kind='stable')
         
         print(results)
         
@@ -309,56 +514,174 @@ async def find_movie(query: str, threshold):
         return []
 
 
-async def generate_recommendations(job_id: str, ratings: List[Rating], algorithm: AlgorithmType, params):
+# Algorithms dispatched to the process pool, the others are cheap enough for threads
+PROCESS_POOL_ALGORITHMS = {AlgorithmType.KNN_USER}
+
+
+# Params of every algorithm with their defaults, fixedReturns applies to all
+ALGORITHM_PARAMS = {
+    AlgorithmType.KNN_USER: {
+        'k': 100,
+        'minCommonUsers': 30,
+        'moviesToConsider': None,  # Score every movie rated by the neighbors
+        'neighborIndex': 'brute',  # 'brute' for exact search, 'lsh' for the approximate index
+    },
+    AlgorithmType.KNN_ITEM: {
+        'k': 100,
+        'minCommonItems': 30,
+    },
+    AlgorithmType.CONTENT_BASED: {
+        'minSimilarity': 100,
+    },
+    AlgorithmType.SVD: {
+        'foldIn': 'average',  # 'average' of the rated items' factors or 'regularized' least squares
+    },
+}
+
+
+def normalize_params(algorithm: AlgorithmType, params) -> dict:
+    """The params used by `algorithm`, defaults filled in and unrelated keys dropped."""
+    params = params or {}
+    normalized = {'fixedReturns': params.get('fixedReturns', 5)}
+    for name, default in ALGORITHM_PARAMS[algorithm].items():
+        normalized[name] = params.get(name, default)
+    return normalized
+
+
+def run_algorithm(algorithm: AlgorithmType, ratings: List[Rating], params, progress=None, seed=None):
+    """
+    Run one algorithm synchronously, in whatever process calls it. `seed`
+    fixes the random sampling steps so identical requests get identical results.
+    """
+    params = normalize_params(algorithm, params)
+    print(params)
+    fixed_count = params['fixedReturns']
+
+    recommendations = []
+    if algorithm == AlgorithmType.KNN_USER:
+        if params['neighborIndex'] not in USER_NEIGHBOR_INDEXES:
+            raise ValueError(f"Unknown neighborIndex '{params['neighborIndex']}', "
+                             f"expected one of {list(USER_NEIGHBOR_INDEXES)}")
+
+        recommendations = recommend_kNN_user_based(ratings, fixed_count, params['k'], params['minCommonUsers'],
+                                                   params['moviesToConsider'], params['neighborIndex'], seed=seed)
+    
+    elif algorithm == AlgorithmType.KNN_ITEM:
+        recommendations = recommend_kNN_item_based(ratings, fixed_count, params['k'], params['minCommonItems'],
+                                                   progress=progress)
+    
+    elif algorithm == AlgorithmType.CONTENT_BASED:
+        recommendations = recommend_SAE(ratings, fixed_count, params['minSimilarity'])
+    
+    elif algorithm == AlgorithmType.SVD:
+        print('start svd')
+        recommendations = SVD_recommendation(ratings, fixed_count, params['foldIn'])
+
+    return recommendations
+
+
+def run_batch(algorithm: AlgorithmType, users: List[List[Rating]], params):
+    """
+    Yield one JobStatus per ratings list, in order, as soon as it is ready.
+    SVD and content based score the whole batch with matrix products, the
+    kNN algorithms run user by user, on the process workers for the
+    PROCESS_POOL_ALGORITHMS when the pool is used. A failing user does not
+    stop the batch.
+    """
+    params = normalize_params(algorithm, params)
+    if algorithm == AlgorithmType.SVD:
+        results = SVD_recommendation_batch(users, params['fixedReturns'], params['foldIn'])
+    elif algorithm == AlgorithmType.CONTENT_BASED:
+        results = recommend_SAE_batch(users, params['fixedReturns'], params['minSimilarity'])
+    elif algorithm in PROCESS_POOL_ALGORITHMS and RecommendationExecutor.uses_processes():
+        # Only the process workers hold these models, the users are spread over them
+        futures = [RecommendationExecutor.submit(run_algorithm, algorithm, ratings, params, process=True,
+                                                 seed=key_seed(request_key(ratings, algorithm, params)))
+                   for ratings in users]
+        results = (_result_or_error(future) for future in futures)
+    else:
+        results = (_run_or_error(algorithm, ratings, params) for ratings in users)
+
+    for result in results:
+        if isinstance(result, Exception):
+            yield JobStatus(status="failed", error=str(result))
+        else:
+            yield JobStatus(status="completed", results=result)
+
+
+def _run_or_error(algorithm: AlgorithmType, ratings: List[Rating], params):
     try:
-        print(params)
-        fixed_count = 5
-        if 'fixedReturns' in params:
-            fixed_count = params['fixedReturns']
-
-        recommendations = []
-        if algorithm == AlgorithmType.KNN_USER:
-            k = 100
-            minCommonUsers = 30
-            moviesToConsider = 100
-            if 'k' in params:
-                k = params['k']
-            if 'minCommonUsers' in params:
-                minCommonUsers = params['minCommonUsers']
-            if 'moviesToConsider' in params:
-                moviesToConsider = params['moviesToConsider']
-
-            recommendations = recommend_kNN_user_based(ratings, fixed_count, k, minCommonUsers, moviesToConsider)
-        
-        elif algorithm == AlgorithmType.KNN_ITEM:
-            k = 100
-            minCommonItems = 30
-            if 'k' in params:
-                k = params['k']
-            if 'minCommonItems' in params:
-                minCommonItems = params['minCommonItems']
+        return run_algorithm(algorithm, ratings, params, seed=key_seed(request_key(ratings, algorithm, params)))
+    except Exception as e:
+        return e
 
 
-            recommendations = await recommend_kNN_item_based(ratings, fixed_count, k, minCommonItems, jobid=job_id)
-        
-        elif algorithm == AlgorithmType.CONTENT_BASED:
-            min_similarity = 100
-            if 'minSimilarity' in params:
-                min_similarity = params['minSimilarity']
+def _result_or_error(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
+def job_progress(job_id: str):
+    """Callback that reports progress strings of a thread-pool job to the JobStore."""
+    loop = asyncio.get_running_loop()
+
+    def progress(status: str):
+        asyncio.run_coroutine_threadsafe(JobStore.update_job(job_id, JobStatus(status=status)), loop)
+
+    return progress
+
+
+async def run_recommendations(ratings: List[Rating], algorithm: AlgorithmType, params, progress=None):
+    """
+    Run one algorithm on the executor pools and record its duration in the
+    cost model, or answer from the result cache for a request already seen.
+    Waits for the algorithm's models when they are still loading.
+    """
+    params = normalize_params(algorithm, params)
+    key = request_key(ratings, algorithm, params)
+    cached = ResultCache.get(key)
+    if cached is not None:
+        return cached
+
+    await ModelReadiness.wait(algorithm)
+
+    start = time.time()
+    # The event loop only does bookkeeping, the algorithm runs on a pool
+    if algorithm in PROCESS_POOL_ALGORITHMS and RecommendationExecutor.uses_processes():
+        recommendations = await RecommendationExecutor.run(run_algorithm, algorithm, ratings, params,
+                                                           seed=key_seed(key), process=True)
+    else:
+        recommendations = await RecommendationExecutor.run(run_algorithm, algorithm, ratings, params,
+                                                           progress=progress, seed=key_seed(key))
+    CostModel.observe(algorithm, time.time() - start)
+    ResultCache.put(key, recommendations)
+    return recommendations
 
-            recommendations = recommend_SAE(ratings, fixed_count, min_similarity)
-        
-        elif algorithm == AlgorithmType.SVD:
-            print('start svd')
-            recommendations = SVD_recommendation(ratings, fixed_count)
 
+async def complete_job(job_id: str, recommendations: Awaitable[List[MovieRecommendation]]):
+    """Store the outcome of `recommendations` as the final status of the job."""
+    try:
+        results = await recommendations
         await JobStore.update_job(
             job_id,
-            JobStatus(status="completed", results=recommendations)
+            JobStatus(status="completed", results=results)
         )
     except Exception as e:
         print(e)
         await JobStore.update_job(
             job_id,
             JobStatus(status="failed", error=str(e))
-        )
\ No newline at end of file
+        )
+
+
+async def generate_recommendations(job_id: str, ratings: List[Rating], algorithm: AlgorithmType, params):
+    async def run():
+        if not ModelReadiness.is_ready(algorithm):
+            await JobStore.update_job(job_id, JobStatus(status="waiting for models"))
+            await ModelReadiness.wait(algorithm)
+        await JobStore.update_job(job_id, JobStatus(status="running"))
+        return await run_recommendations(ratings, algorithm, params, progress=job_progress(job_id))
+
+    await complete_job(job_id, run())
@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from app.models.recommendation import AlgorithmType, MovieRecommendation, Rating
+
+
+def request_key(ratings: Sequence[Rating], algorithm: AlgorithmType, params: dict) -> str:
+    """
+    Canonical sha256 of a request: the ratings sorted by id, the algorithm
+    and the already normalized params. Reordered ratings or omitted default
+    params give the same key.
+    """
+    payload = {
+        'ratings': sorted((rating.imdb_id, float(rating.rating)) for rating in ratings),
+        'algorithm': algorithm.value,
+        'params': params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def key_seed(key: str) -> int:
+    """Seed for the stochastic steps of a request, so a recomputation matches the cached result."""
+    return int(key[:16], 16)
+
+
+def data_version(root: str = './Data') -> str:
+    """
+    Digest of the paths, sizes and modification times of the model artifacts
+    under `root`, or of `root` itself when it is a file.
+    """
+    digest = hashlib.sha256()
+    if os.path.isfile(root):
+        stat = os.stat(root)
+        digest.update(f'{os.path.basename(root)}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            stat = os.stat(os.path.join(dirpath, filename))
+            digest.update(f'{os.path.relpath(os.path.join(dirpath, filename), root)}:{stat.st_size}:'
+                          f'{stat.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    LRU cache of recommendation results keyed on `request_key`.
+
+    Entries expire `ttl_seconds` after they were stored and the least
+    recently used entry is evicted past `max_entries`. The cache belongs to
+    one process, whose models are loaded once at startup, so its entries
+    never outlive the models that computed them.
+    """
+    max_entries = int(os.environ.get('MOVIEREC_CACHE_SIZE', 1024))
+    ttl_seconds = float(os.environ.get('MOVIEREC_CACHE_TTL', 3600))
+    _entries: "OrderedDict[str, tuple]" = OrderedDict()
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    @classmethod
+    def get(cls, key: str) -> Optional[List[MovieRecommendation]]:
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and time.time() - entry[0] > cls.ttl_seconds:
+                del cls._entries[key]
+                entry = None
+            if entry is None:
+                cls._misses += 1
+                return None
+            cls._entries.move_to_end(key)
+            cls._hits += 1
+            return list(entry[1])
+
+    @classmethod
+    def put(cls, key: str, results: List[MovieRecommendation]):
+        with cls._lock:
+            cls._entries[key] = (time.time(), tuple(results))
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.max_entries:
+                cls._entries.popitem(last=False)
+                cls._evictions += 1
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def stats(cls) -> Dict[str, object]:
+        with cls._lock:
+            lookups = cls._hits + cls._misses
+            return {
+                'entries': len(cls._entries),
+                'max_entries': cls.max_entries,
+                'ttl_seconds': cls.ttl_seconds,
+                'hits': cls._hits,
+                'misses': cls._misses,
+                'hit_rate': cls._hits / lookups if lookups else 0.0,
+                'evictions': cls._evictions,
+            }
@@ -0,0 +1,94 @@
+import re
+import time
+import logging
+import unicodedata
+from collections import defaultdict
+from typing import List, Tuple
+import numpy as np
+from thefuzz import process
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_title(title: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    title = unicodedata.normalize('NFKD', str(title))
+    title = ''.join(c for c in title if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', title).strip()
+
+
+def ngrams(text: str, n: int = 3) -> set:
+    """Character n-grams of a normalized string, padded so short words still produce grams."""
+    padded = f' {text} '
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleSearchIndex:
+    """
+    Fuzzy title search over a character n-gram inverted index.
+
+    Titles are normalized once and every n-gram points to the titles that
+    contain it. A query scores titles on the n-grams they share with it to
+    shortlist the `shortlist_size` best candidates, and only those go
+    through thefuzz's scorer, instead of every title in the catalogue.
+    """
+
+    def __init__(self, titles, n: int = 3, shortlist_size: int = 200):
+        start = time.time()
+        self.n = n
+        self.shortlist_size = shortlist_size
+        self.titles = list(titles)
+        self.normalized = [normalize_title(title) for title in self.titles]
+
+        postings = defaultdict(list)
+        self.gram_counts = np.zeros(len(self.titles), dtype=np.int32)
+        for position, title in enumerate(self.normalized):
+            grams = ngrams(title, n)
+            self.gram_counts[position] = len(grams)
+            for gram in grams:
+                postings[gram].append(position)
+        self.postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+        # Titles shorter than n share no n-gram with a longer query that contains them
+        self.short_titles = [position for position, title in enumerate(self.normalized) if 0 < len(title) < n]
+        logger.info(f'Title index over {len(self.titles)} titles ({len(self.postings)} grams) '
+                    f'built in {time.time() - start:.2f}s')
+
+    def shortlist(self, query: str) -> np.ndarray:
+        """
+        Positions of the titles likeliest to score best against the query, in
+        catalogue order. Shared n-grams are weighed against both sizes (Dice)
+        and, discounted as WRatio discounts partial matches, against the
+        smaller one, which ranks a title contained in the query or containing
+        it as high as the scorer does. Raw counts would favor long titles.
+        """
+        normalized = normalize_title(query)
+        grams = ngrams(normalized, self.n)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        contained = np.array([position for position in self.short_titles if self.normalized[position] in normalized],
+                             dtype=np.int64)
+        if not hits and len(contained) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.titles)) if hits else np.zeros(0)
+        matched = np.setdiff1d(np.flatnonzero(shared), contained)
+        sizes = self.gram_counts[matched]
+        scores = np.maximum(2 * shared[matched] / (sizes + len(grams)),
+                            0.9 * shared[matched] / np.minimum(sizes, len(grams)))
+        matched = np.concatenate([matched, contained])
+        scores = np.concatenate([scores, np.full(len(contained), np.inf)])
+
+        if len(matched) > self.shortlist_size:
+            best = np.argpartition(-scores, self.shortlist_size - 1)[:self.shortlist_size]
+            matched = matched[best]
+        # Ties then rank as in a scan of the whole catalogue, by position
+        return np.sort(matched)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Best fuzzy matches as (title, score, position) tuples, best first,
+        in the same format as thefuzz.process.extractBests.
+        """
+        candidates = {int(position): self.titles[position] for position in self.shortlist(query)}
+        if not candidates:
+            return []
+        return process.extractBests(query, candidates, limit=limit)
@@ -0,0 +1,57 @@
+"""
+Precompute recommendations for many imported profiles at once.
+
+The profiles are a CSV with one rating per line and the columns user_id,
+imdb_id ('tt0111161' style) and rating. Output is newline-delimited JSON,
+one line per user, in the format of POST /api/recommendations/batch. SVD
+and content based score the users together with matrix products.
+
+Run from the backend directory:
+    python -m scripts.batch_recommend profiles.csv --algorithm svd --output recommendations.ndjson
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+import pandas as pd
+
+from app.models.recommendation import AlgorithmType, Rating
+from app.services import recommendation_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profiles', help='CSV of user_id, imdb_id, rating')
+    parser.add_argument('--algorithm', default=AlgorithmType.SVD.value, choices=[a.value for a in AlgorithmType])
+    parser.add_argument('--params', default='{}', help='JSON params shared by every user, e.g. \'{"fixedReturns": 20}\'')
+    parser.add_argument('--output', default=None, help='NDJSON file to write (default: stdout)')
+    args = parser.parse_args()
+
+    profiles = pd.read_csv(args.profiles, dtype={'user_id': str, 'imdb_id': str})
+    user_ids, users = [], []
+    for user_id, group in profiles.groupby('user_id', sort=False):
+        user_ids.append(user_id)
+        users.append([Rating(imdb_id=imdb_id, rating=rating)
+                      for imdb_id, rating in zip(group['imdb_id'], group['rating'])])
+
+    algorithm = AlgorithmType(args.algorithm)
+    # Records go to the real stdout, held here; the status lines printed by the
+    # model loaders and the algorithms are sent to stderr so the NDJSON stays clean
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            recommendation_engine.load_models([algorithm])
+
+            start = time.time()
+            statuses = recommendation_engine.run_batch(algorithm, users, json.loads(args.params))
+            for user_id, status in zip(user_ids, statuses):
+                output.write(json.dumps({"userId": user_id, **status.model_dump()}) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"Scored {len(users)} users with {args.algorithm} in {time.time() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
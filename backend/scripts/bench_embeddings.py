@@ -0,0 +1,62 @@
+"""
+Compare content-based top-N results and latency across embedding precisions.
+
+Every precision is exported to a temporary artifact directory and opened
+memory-mapped, the way the server loads it. Random ratings lists are scored
+against each one and compared with the float32 results.
+
+Run from the backend directory:
+    python -m scripts.bench_embeddings --queries 200 --ratings 20 --top 10
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from app.models.content_based import EmbeddingIndex, PRECISIONS, top_n_indices
+
+
+def recommend(index, rows, top):
+    similarities = index.similarities(rows)
+    similarities[rows] = float('-inf')
+    return top_n_indices(similarities, top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='./Data/SAE_embedding.npy', help='raw embeddings .npy')
+    parser.add_argument('--queries', type=int, default=200, help='number of random ratings lists')
+    parser.add_argument('--ratings', type=int, default=20, help='rated movies per list')
+    parser.add_argument('--top', type=int, default=10, help='recommendations per list')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    reference = EmbeddingIndex(np.load(args.source, allow_pickle=True))
+    rng = np.random.default_rng(args.seed)
+    queries = [rng.choice(reference.n_movies, size=args.ratings, replace=False) for _ in range(args.queries)]
+
+    print(f"{'precision':<10}{'MB':>10}{'overlap':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        expected = None
+        for precision in PRECISIONS:
+            path = os.path.join(tmp, precision)
+            reference.save(path, precision)
+            index = EmbeddingIndex.load(path)
+            size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+
+            latencies, results = [], []
+            for rows in queries:
+                start = time.perf_counter()
+                results.append(recommend(index, rows, args.top))
+                latencies.append(time.perf_counter() - start)
+
+            if expected is None:
+                expected = results
+            overlap = np.mean([len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(expected, results)])
+            print(f"{precision:<10}{size:>10.2f}{overlap:>10.3f}"
+                  f"{np.percentile(latencies, 50) * 1000:>10.3f}{np.percentile(latencies, 95) * 1000:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Latency of the indexed title search against the full fuzzy scan over a query log.
+
+The query log is a text file with one query per line (e.g. extracted from
+the access log of /movies/find/{query}). Without one, queries are derived
+from catalogue titles: prefixes, single-word queries and typos.
+
+Run from the backend directory:
+    python -m scripts.bench_title_search --log queries.txt
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from thefuzz import process
+
+from app.services.title_search import TitleSearchIndex
+
+
+def sample_queries(titles, count, rng):
+    queries = []
+    for title in rng.choice(titles, size=count):
+        title = str(title)
+        kind = rng.integers(3)
+        if kind == 0:
+            queries.append(title[:max(3, len(title) // 2)])
+        elif kind == 1:
+            queries.append(max(title.split(), key=len))
+        else:
+            position = rng.integers(len(title))
+            queries.append(title[:position] + title[position + 1:])
+    return queries
+
+
+def timed(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', default='./Data/movie_names_dates_imdb.csv', help='movie names table')
+    parser.add_argument('--log', default=None, help='query log, one query per line')
+    parser.add_argument('--queries', type=int, default=200, help='sampled queries when no log is given')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    titles = pd.read_csv(args.titles, index_col=0)['title'].reset_index(drop=True)
+    if args.log:
+        with open(args.log) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(titles.to_numpy(), args.queries, np.random.default_rng(args.seed))
+
+    start = time.time()
+    index = TitleSearchIndex(titles)
+    print(f"Index built in {time.time() - start:.2f}s for {len(titles)} titles, {len(queries)} queries")
+
+    scan_ms, expected = timed(lambda q: process.extractBests(q, titles, limit=10), queries)
+    index_ms, found = timed(lambda q: index.search(q, limit=10), queries)
+
+    # Scores of the full scan's top 10 that the index also returns
+    overlap = np.mean([len({m[2] for m in a} & {m[2] for m in b}) / max(len(a), 1) for a, b in zip(expected, found)])
+    same_best = np.mean([bool(a) and bool(b) and a[0][1] == b[0][1] for a, b in zip(expected, found)])
+    # Titles differing only among equal scores still rank the same
+    same_scores = np.mean([[m[1] for m in a] == [m[1] for m in b] for a, b in zip(expected, found)])
+
+    print(f"{'search':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, latencies in (('scan', scan_ms), ('index', index_ms)):
+        print(f"{name:<10}{np.percentile(latencies, 50):>10.2f}{np.percentile(latencies, 95):>10.2f}"
+              f"{latencies.max():>10.2f}")
+    print(f"top-10 overlap: {overlap:.3f}, same best score: {same_best:.3f}, same top-10 scores: {same_scores:.3f}")
+
+
+if __name__ == '__main__':
+    main()
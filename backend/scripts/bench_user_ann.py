@@ -0,0 +1,87 @@
+"""
+Offline recall@k versus latency report for the approximate user index.
+
+Sampled users are queried against the brute-force cosine index (the
+baseline) and against random-projection LSH indexes of several sizes. Each
+user's own row is dropped from both result lists before computing recall.
+
+Run from the backend directory:
+    python -m scripts.bench_user_ann --queries 200 --k 100
+    python -m scripts.bench_user_ann --save    # also persist the default index
+"""
+import argparse
+import json
+import time
+import numpy as np
+import scipy
+from sklearn.neighbors import NearestNeighbors
+
+from app.models.ann import RandomProjectionLSH
+
+CONFIGS = [(4, 10), (8, 12), (16, 12), (16, 14), (32, 14)]
+
+
+def timed_neighbors(index, queries, k):
+    latencies, results = [], []
+    for q in range(queries.shape[0]):
+        start = time.perf_counter()
+        _, indices = index.kneighbors(queries[q], n_neighbors=k + 1)
+        latencies.append(time.perf_counter() - start)
+        results.append(indices[0])
+    return np.array(latencies), results
+
+
+def recall_at_k(exact, approximate, users, k):
+    recalls = []
+    for user, truth, found in zip(users, exact, approximate):
+        truth = set(truth[truth != user][:k].tolist())
+        found = set(found[found != user][:k].tolist())
+        recalls.append(len(truth & found) / max(len(truth), 1))
+    return float(np.mean(recalls))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matrix', default='./Data/sparse_ratings_matrix.npz', help='users x movies ratings matrix')
+    parser.add_argument('--queries', type=int, default=200, help='number of sampled query users')
+    parser.add_argument('--k', type=int, default=100, help='neighbors per query')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', default=None, help='optional path of a JSON report')
+    parser.add_argument('--save', action='store_true', help='save the default LSH index to ./Data/user_lsh.npz')
+    args = parser.parse_args()
+
+    ratings_matrix = scipy.sparse.load_npz(args.matrix).tocsr()
+    rng = np.random.default_rng(args.seed)
+    users = rng.choice(ratings_matrix.shape[0], size=min(args.queries, ratings_matrix.shape[0]), replace=False)
+    queries = ratings_matrix[users]
+
+    brute = NearestNeighbors(metric='cosine', algorithm='brute', n_jobs=-1).fit(ratings_matrix)
+    brute_latency, exact = timed_neighbors(brute, queries, args.k)
+
+    rows = [{'index': 'brute', 'build_s': 0.0, 'recall': 1.0,
+             'p50_ms': np.percentile(brute_latency, 50) * 1000, 'p95_ms': np.percentile(brute_latency, 95) * 1000}]
+
+    for n_tables, n_bits in CONFIGS:
+        start = time.time()
+        lsh = RandomProjectionLSH(n_tables=n_tables, n_bits=n_bits).fit(ratings_matrix)
+        build = time.time() - start
+        latency, approximate = timed_neighbors(lsh, queries, args.k)
+        rows.append({'index': f'lsh {n_tables}x{n_bits}', 'build_s': build,
+                     'recall': recall_at_k(exact, approximate, users, args.k),
+                     'p50_ms': np.percentile(latency, 50) * 1000, 'p95_ms': np.percentile(latency, 95) * 1000})
+
+    print(f"\nrecall@{args.k} over {len(users)} users, {ratings_matrix.shape[0]} indexed")
+    print(f"{'index':<14}{'build s':>10}{'recall':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(f"{row['index']:<14}{row['build_s']:>10.2f}{row['recall']:>10.3f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+    if args.save:
+        RandomProjectionLSH().fit(ratings_matrix).save('./Data/user_lsh.npz')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+Build the item-item top-K neighbor table used by the item-based recommender.
+
+Run from the backend directory:
+    python -m scripts.build_item_neighbors --k 100
+"""
+import argparse
+import scipy
+
+from app.models.item_neighbors import ItemNeighborTable
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matrix', default='./Data/sparse_ratings_matrix.npz', help='users x movies ratings matrix')
+    parser.add_argument('--output', default='./Data/item_neighbors.npz', help='where to write the table')
+    parser.add_argument('--k', type=int, default=100, help='neighbors kept per movie')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='movies scored per matrix product')
+    parser.add_argument('--jobs', type=int, default=None, help='number of threads (default: CPU count)')
+    args = parser.parse_args()
+
+    ratings_matrix = scipy.sparse.load_npz(args.matrix)
+    table = ItemNeighborTable.build(ratings_matrix, k=args.k, chunk_size=args.chunk_size, n_jobs=args.jobs)
+    table.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
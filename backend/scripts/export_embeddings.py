@@ -0,0 +1,24 @@
+"""
+Convert the SAE embeddings into a memory-mappable artifact directory.
+
+Run from the backend directory:
+    python -m scripts.export_embeddings --precision float16
+"""
+import argparse
+import numpy as np
+
+from app.models.content_based import EmbeddingIndex, PRECISIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='./Data/SAE_embedding.npy', help='raw embeddings .npy')
+    parser.add_argument('--output', default='./Data/SAE_embedding', help='artifact directory')
+    parser.add_argument('--precision', default='float16', choices=PRECISIONS)
+    args = parser.parse_args()
+
+    EmbeddingIndex(np.load(args.source, allow_pickle=True)).save(args.output, args.precision)
+
+
+if __name__ == '__main__':
+    main()
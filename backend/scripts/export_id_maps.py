@@ -0,0 +1,34 @@
+"""
+Convert the pickled IMDb id <-> matrix index dicts into plain arrays.
+
+The server loads ./Data/movie_ids.npz and ./Data/SAE_ids.npz when they exist,
+and converts the pickled dicts at every startup otherwise.
+
+Run from the backend directory:
+    python -m scripts.export_id_maps
+"""
+import argparse
+import numpy as np
+
+from app.services.id_translation import IdTranslation
+
+ID_MAPS = {
+    # output: (IMDb id -> index dict, index -> IMDb id dict)
+    './Data/movie_ids.npz': ('./Data/movie_mapping.npy', './Data/reverse_movie_mapping.npy'),
+    './Data/SAE_ids.npz': ('./Data/mapping_SAE.npy', './Data/reverse_mapping_SAE.npy'),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    for output, (mapping_path, reverse_path) in ID_MAPS.items():
+        translation = IdTranslation.from_dicts(np.load(mapping_path, allow_pickle=True).item(),
+                                               np.load(reverse_path, allow_pickle=True).item())
+        translation.save(output)
+        print(f"{mapping_path} -> {output}: {len(translation)} movies")
+
+
+if __name__ == '__main__':
+    main()
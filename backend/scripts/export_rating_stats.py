@@ -0,0 +1,33 @@
+"""
+Compute the per-user and per-movie rating statistics and save them.
+
+The server loads ./Data/rating_stats.npz while the ratings table it was
+computed from is unchanged, and recomputes (and saves) it otherwise.
+
+Run from the backend directory:
+    python -m scripts.export_rating_stats
+"""
+import argparse
+import scipy
+
+from app.services.columnar_table import read_table, table_source
+from app.services.rating_stats import RatingStats
+from app.services.result_cache import data_version
+from app.services.recommendation_engine import RATINGS_TABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matrix', default='./Data/sparse_ratings_matrix.npz', help='users x movies ratings matrix')
+    parser.add_argument('--output', default='./Data/rating_stats.npz')
+    args = parser.parse_args()
+
+    n_users, n_movies = scipy.sparse.load_npz(args.matrix).shape
+    stats = RatingStats.from_ratings(read_table(*RATINGS_TABLE), n_users, n_movies,
+                                     source=data_version(table_source(*RATINGS_TABLE)))
+    stats.save(args.output)
+    print(f"Rating statistics of {n_users} users and {n_movies} movies saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
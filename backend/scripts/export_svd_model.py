@@ -0,0 +1,29 @@
+"""
+Convert a joblib SVD model into a memory-mappable artifact directory.
+
+The server loads ./Data/svd_model when it exists, and the joblib file otherwise.
+
+Run from the backend directory:
+    python -m scripts.export_svd_model --source ./Data/sample_svd_model14.joblib
+"""
+import argparse
+
+from app.models.SparseSVDRecommender import SparseSVDRecommender
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default='./Data/sample_svd_model14.joblib', help='joblib model file')
+    parser.add_argument('--output', default='./Data/svd_model', help='artifact directory')
+    parser.add_argument('--dtype', default='float64', choices=('float64', 'float32'),
+                        help='float type of the stored factors and biases')
+    args = parser.parse_args()
+
+    model = SparseSVDRecommender().load_model(args.source, mmap_mode=None)
+    if model is None:
+        raise SystemExit(f"Could not load {args.source}")
+    model.save_artifact(args.output, dtype=args.dtype)
+
+
+if __name__ == '__main__':
+    main()
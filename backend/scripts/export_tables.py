@@ -0,0 +1,43 @@
+"""
+Convert the ratings and movie names CSVs into columnar tables of .npy files.
+
+The server loads ./Data/df_ratings_knn and ./Data/movie_names_dates_imdb when
+they exist, and parses the CSVs otherwise. Ids are stored as int32 and the
+half-star ratings as one byte each.
+
+Run from the backend directory:
+    python -m scripts.export_tables
+"""
+import argparse
+import os
+import time
+import pandas as pd
+
+from app.services.columnar_table import load_table, save_table, table_files
+
+TABLES = ('./Data/df_ratings_knn.csv', './Data/movie_names_dates_imdb.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('csv', nargs='*', default=TABLES, help='CSV files to convert, next to their table directory')
+    args = parser.parse_args()
+
+    for csv_path in args.csv:
+        start = time.time()
+        df = pd.read_csv(csv_path, index_col=0)
+        csv_seconds = time.time() - start
+
+        dirpath = os.path.splitext(csv_path)[0]
+        save_table(df, dirpath)
+        start = time.time()
+        load_table(dirpath)
+        table_seconds = time.time() - start
+
+        table_bytes = sum(os.path.getsize(path) for path in table_files(dirpath))
+        print(f"{csv_path}: {len(df)} rows, {os.path.getsize(csv_path) / 1e6:.1f} MB read in {csv_seconds:.2f}s")
+        print(f"{dirpath}: {table_bytes / 1e6:.1f} MB read in {table_seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Train the SVD recommender on the users x movies ratings matrix and save it.
+
+The matrix columns are the sparse movie ids used by the API, so the saved
+model can replace the one loaded by the server. Per-epoch RMSE and time are
+printed and stored in the model file.
+
+Run from the backend directory:
+    python -m scripts.train_svd --solver minibatch --output ./Data/svd_model.joblib
+    python -m scripts.train_svd --solver als --epochs 10 --regularization 0.5
+"""
+import argparse
+import scipy
+
+from app.models.SparseSVDRecommender import SOLVERS, SparseSVDRecommender
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--matrix', default='./Data/sparse_ratings_matrix.npz', help='users x movies ratings matrix')
+    parser.add_argument('--output', default='./Data/svd_model.joblib', help='where to write the model')
+    parser.add_argument('--solver', default='minibatch', choices=SOLVERS)
+    parser.add_argument('--factors', type=int, default=100, help='latent factors')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--learning-rate', type=float, default=0.005)
+    parser.add_argument('--regularization', type=float, default=0.02,
+                        help='penalty per rating; als, solving exactly, usually wants a larger one than sgd')
+    parser.add_argument('--batch-size', type=int, default=4096, help='ratings per update of the minibatch solver')
+    parser.add_argument('--jobs', type=int, default=None, help='threads of the als solver (default: CPU count)')
+    args = parser.parse_args()
+
+    ratings_matrix = scipy.sparse.load_npz(args.matrix).tocsr()
+    model = SparseSVDRecommender(n_factors=args.factors, learning_rate=args.learning_rate,
+                                 regularization=args.regularization, n_epochs=args.epochs)
+    model.fit(ratings_matrix, solver=args.solver, batch_size=args.batch_size, n_jobs=args.jobs)
+    model.save_model(args.output)
+
+
+if __name__ == '__main__':
+    main()
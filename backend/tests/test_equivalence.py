@@ -0,0 +1,410 @@
+"""
+The vectorized paths against the per-item loops they replaced, on small
+seeded fixtures. Each reference implementation is the old loop, trimmed to
+its arithmetic.
+
+Run from the backend directory:
+    python -m pytest
+"""
+import asyncio
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix, random as sparse_random
+from sklearn.neighbors import NearestNeighbors
+
+from app.models.SparseSVDRecommender import SparseSVDRecommender, transform_rating
+from app.models.collaborative import score_user_based_candidates
+from app.models.content_based import EmbeddingIndex
+from app.models.id_map import IdMap
+from app.models.item_neighbors import ItemNeighborTable
+from app.models.recommendation import AlgorithmType, JobStatus, MovieRecommendation, Rating
+from app.services import recommendation_engine as engine
+from app.services.columnar_table import load_table, save_table
+from app.services.id_translation import IdTranslation
+from app.services.job_stores import JobStore
+from app.services.movie_metadata import MovieMetadata
+from app.services.rating_stats import RatingStats
+from app.services.result_cache import ResultCache, request_key
+
+
+def ratings_matrix(n_users, n_movies, density, seed):
+    rng = np.random.default_rng(seed)
+    matrix = sparse_random(n_users, n_movies, density=density, format='csr', random_state=rng)
+    matrix.data = rng.integers(1, 11, size=matrix.nnz) / 2
+    return matrix
+
+
+def formating_imdbId(x):
+    # The id formatting the engine used before IdTranslation
+    return 'tt' + str(round(x)).zfill(7)
+
+
+# ------------------------------------------ kNN ------------------------------------------------
+
+def test_user_based_scores_match_per_movie_loop():
+    rng = np.random.default_rng(0)
+    neighbor_rows = ratings_matrix(25, 40, 0.4, seed=1)
+    weights = rng.uniform(-0.2, 1, size=25)
+    neighbor_means = rng.uniform(2, 4, size=25)
+    neighbor_stds = rng.uniform(0.5, 1.5, size=25)
+    neighbor_stds[3] = np.nan
+    mean_user, std_user, global_mean = 3.5, 0.8, 3.1
+    candidates = np.arange(40)
+
+    scores = score_user_based_candidates(neighbor_rows, weights, neighbor_means, neighbor_stds, mean_user,
+                                         std_user, global_mean, candidates, number_of_users=8)
+
+    dense = neighbor_rows.toarray()
+    for position, movie in enumerate(candidates):
+        raters = [(row, weights[row]) for row in np.flatnonzero(dense[:, movie]) if weights[row] > 0]
+        top = heapq.nlargest(8, raters, key=lambda rater: rater[1])
+        if len(top) < 3:
+            expected = {'basic': global_mean, 'mean_centering': global_mean, 'z_normalization': global_mean}
+        else:
+            rows = np.array([row for row, _ in top])
+            w = weights[rows]
+            weighted_diff = w * (dense[rows, movie] - neighbor_means[rows])
+            denominator = np.abs(w).sum()
+            expected = {
+                'basic': (w * dense[rows, movie]).sum() / denominator,
+                'mean_centering': weighted_diff.sum() / denominator + mean_user,
+                # pandas' sum skips the NaN of an undefined std
+                'z_normalization': np.nansum(weighted_diff / neighbor_stds[rows]) * std_user / denominator
+                                   + mean_user,
+            }
+        for method, value in expected.items():
+            assert scores[method][position] == pytest.approx(value)
+
+
+def test_item_neighbor_table_matches_brute_force_knn():
+    matrix = ratings_matrix(60, 30, 0.3, seed=2)
+    table = ItemNeighborTable.build(matrix, k=6, chunk_size=7, n_jobs=2)
+
+    movies = matrix.T.tocsr()
+    knn = NearestNeighbors(metric='cosine', algorithm='brute').fit(movies)
+    distances, indices = knn.kneighbors(movies, n_neighbors=7)
+    for movie in range(movies.shape[0]):
+        # The movie itself comes first, then its neighbors; the table keeps the positive ones
+        neighbors = [(index, 1 - distance) for index, distance in zip(indices[movie], distances[movie])
+                     if index != movie][:6]
+        neighbors = [(index, similarity) for index, similarity in neighbors if similarity > 1e-6]
+        assert table.similarities[movie, :len(neighbors)] == pytest.approx(
+            [similarity for _, similarity in neighbors], abs=1e-5)
+        assert (table.indices[movie, len(neighbors):] == -1).all()
+
+    rows, cols = np.array([0, 4, 9, 17]), np.array([1, 4, 12, 20, 29])
+    expected = np.zeros((len(rows), len(cols)))
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            for a, b in ((row, col), (col, row)):
+                listed = table.indices[a] == b
+                if listed.any():
+                    expected[i, j] = max(expected[i, j], table.similarities[a][listed][0])
+    assert table.pairwise(rows, cols) == pytest.approx(expected)
+
+
+def test_rating_stats_match_groupby():
+    rng = np.random.default_rng(3)
+    df_ratings = pd.DataFrame({'sparse_user_id': rng.integers(0, 12, 200), 'sparse_movie_id': rng.integers(0, 9, 200),
+                               'rating': rng.integers(1, 11, 200) / 2})
+    stats = RatingStats.from_ratings(df_ratings, n_users=13, n_movies=9)
+
+    for key, prefix in (('sparse_user_id', 'user'), ('sparse_movie_id', 'movie')):
+        grouped = df_ratings.groupby(key)['rating']
+        size = len(getattr(stats, f'{prefix}_mean'))
+        for field, values in (('mean', grouped.mean()), ('std', grouped.std())):
+            expected = values.reindex(range(size)).to_numpy()
+            assert np.allclose(getattr(stats, f'{prefix}_{field}'), expected, equal_nan=True, atol=1e-5)
+    assert stats.global_mean == pytest.approx(df_ratings['rating'].mean())
+
+
+# ------------------------------------------ Ids ------------------------------------------------
+
+def test_id_map_matches_dict():
+    rng = np.random.default_rng(4)
+    mapping = {int(key): position for position, key in enumerate(rng.choice(10 ** 6, size=50, replace=False))}
+    id_map = IdMap.from_dict(mapping)
+
+    queries = np.concatenate([np.array(list(mapping)), rng.integers(0, 10 ** 6, size=50)])
+    assert id_map.lookup(queries).tolist() == [mapping.get(int(key), -1) for key in queries]
+    assert dict(id_map) == mapping
+    assert dict(id_map.reverse()) == {index: key for key, index in mapping.items()}
+    assert all((key in id_map) == (key in mapping) for key in queries.tolist())
+
+
+def test_id_translation_matches_legacy_dicts(tmp_path):
+    # The pickled dicts keyed the IMDb ids as strings and stored the reverse ones as floats
+    imdb_ids = [111161, 68646, 1375666, 4154796, 50083]
+    mapping = {str(imdb_id): index for index, imdb_id in enumerate(imdb_ids)}
+    reverse = {index: float(imdb_id) for index, imdb_id in enumerate(imdb_ids)}
+    translation = IdTranslation.from_dicts(mapping, reverse)
+
+    queries = ['tt0068646', 'tt9999999', 'tt4154796', 'tt0111161']
+    assert translation.indices(queries).tolist() == [mapping.get(str(int(query[2:])), -1) for query in queries]
+    with pytest.raises(KeyError):
+        translation.indices(queries, strict=True)
+    assert translation.imdb_ids([4, 0, 2]) == [formating_imdbId(reverse[index]) for index in (4, 0, 2)]
+
+    translation.save(tmp_path / 'ids.npz')
+    loaded = IdTranslation.load(tmp_path / 'ids.npz')
+    assert loaded.indices(queries).tolist() == translation.indices(queries).tolist()
+    assert loaded.imdb_ids(range(5)) == translation.imdb_ids(range(5))
+
+
+def test_movie_metadata_matches_row_lookups():
+    movie_names = pd.DataFrame({'imdb_id': ['tt0000001', 'tt0000002', 'tt0000003', 'tt0000002'],
+                                'title': ['A', 'B', 'C', 'B again'], 'year': [1999, None, 2005, 2010]})
+    metadata = MovieMetadata(movie_names)
+
+    queries = ['tt0000003', 'tt0000009', 'tt0000002']
+    expected = []
+    for imdb_id in queries:
+        rows = movie_names[movie_names['imdb_id'] == imdb_id]
+        if len(rows):
+            year = rows['year'].iloc[0]
+            expected.append(MovieRecommendation(id=imdb_id, title=rows['title'].iloc[0],
+                                                year=int(year) if year > 0 else None))
+    assert metadata.hydrate(queries) == expected
+
+
+# ------------------------------------------ SVD ------------------------------------------------
+
+def svd_model(seed=5, n_users=20, n_items=30, n_factors=4):
+    rng = np.random.default_rng(seed)
+    model = SparseSVDRecommender(n_factors=n_factors, regularization=0.05)
+    model.user_factors = rng.normal(0, 0.3, (n_users, n_factors))
+    model.item_factors = rng.normal(0, 0.3, (n_items, n_factors))
+    model.user_biases = rng.normal(0, 0.2, n_users)
+    model.item_biases = rng.normal(0, 0.2, n_items)
+    model.global_mean = 3.4
+    model.user_id_map = IdMap.identity(n_users)
+    model.reverse_user_id_map = model.user_id_map.reverse()
+    # Sparse movie ids differ from the item indices
+    model._set_movie_id_map({100 + item: item for item in range(n_items)})
+    return model
+
+
+def average_fold_in_loop(model, movie_ids, ratings, n_items):
+    # handle_new_user before fold_in: one rated movie at a time, then a stable sort of every prediction
+    valid = [(movie, rating) for movie, rating in zip(movie_ids, ratings) if movie in model.movie_id_map]
+    if not valid:
+        return []
+    factors, bias = np.zeros(model.item_factors.shape[1]), 0
+    for movie, rating in valid:
+        factors += rating * model.item_factors[model.movie_id_map[movie]]
+        bias += rating - model.global_mean
+    factors, bias = factors / len(valid), bias / len(valid)
+
+    predictions = model.global_mean + bias + factors @ model.item_factors.T
+    scores = transform_rating(np.clip(predictions, None, 5), 0.5, 5)
+    recommendations = sorted(((model.reverse_movie_id_map[idx], prediction, score)
+                              for idx, (prediction, score) in enumerate(zip(predictions, scores))),
+                             key=lambda recommendation: recommendation[1], reverse=True)
+    rated = {movie for movie, _ in valid}
+    return [(movie, score) for movie, _, score in recommendations if movie not in rated][:n_items]
+
+
+def test_fold_in_and_recommend_batch_match_per_user_loop():
+    model = svd_model()
+    rng = np.random.default_rng(6)
+    users = [(rng.choice(np.arange(95, 135), size=size, replace=False), rng.integers(1, 11, size=size) / 2)
+             for size in (1, 4, 7, 0, 12)]
+
+    expected = [average_fold_in_loop(model, movie_ids, ratings, 6) for movie_ids, ratings in users]
+    for (movie_ids, ratings), reference in zip(users, expected):
+        single = model.handle_new_user(movie_ids, ratings, n_items=6)
+        assert [movie for movie, _ in single] == [movie for movie, _ in reference]
+        assert [score for _, score in single] == pytest.approx([score for _, score in reference])
+
+    rows = np.repeat(np.arange(len(users)), [len(movie_ids) for movie_ids, _ in users])
+    items = model.item_indices(np.concatenate([movie_ids for movie_ids, _ in users]))
+    values = np.concatenate([ratings for _, ratings in users])
+    known = items >= 0
+    batch = list(model.recommend_batch(rows[known], items[known], values[known], len(users), n_items=6,
+                                       chunk_size=2))
+    for recommendations, reference in zip(batch, expected):
+        assert [movie for movie, _ in recommendations] == [movie for movie, _ in reference]
+        assert [score for _, score in recommendations] == pytest.approx([score for _, score in reference])
+
+    # The regularized fold-in gives the same answer one user at a time and batched
+    for user, (movie_ids, ratings) in enumerate(users):
+        single = model.handle_new_user(movie_ids, ratings, n_items=6, method='regularized')
+        batched = list(model.recommend_batch(rows[known], items[known], values[known], len(users), n_items=6,
+                                             method='regularized'))[user]
+        assert [movie for movie, _ in single] == [movie for movie, _ in batched]
+
+
+@pytest.mark.parametrize('threads', [None, 3])
+def test_als_solve_matches_per_row_ridge(threads):
+    model = svd_model()
+    matrix = ratings_matrix(11, 30, 0.3, seed=7)
+    regularization = 0.05
+
+    executor = ThreadPoolExecutor(threads) if threads else None
+    factors, biases = model._als_solve(matrix, model.item_factors, model.item_biases, executor, block_size=4,
+                                       regularization=regularization)
+    if executor is not None:
+        executor.shutdown()
+
+    design = np.hstack([model.item_factors, np.ones((30, 1))])
+    for row in range(matrix.shape[0]):
+        items = matrix[row].indices
+        if len(items) == 0:
+            assert not factors[row].any() and biases[row] == 0
+            continue
+        x = design[items]
+        targets = matrix[row].data - model.global_mean - model.item_biases[items]
+        solution = np.linalg.solve(x.T @ x + regularization * len(items) * np.eye(x.shape[1]), x.T @ targets)
+        assert factors[row] == pytest.approx(solution[:-1])
+        assert biases[row] == pytest.approx(solution[-1])
+
+
+def test_predict_batch_matches_predict():
+    model = svd_model()
+    users, items = np.array([0, 3, 19, 7, 25]), np.array([0, 29, 4, 31, 2])
+    expected = []
+    for user, item in zip(users, items):
+        if user < 20 and item < 30:
+            expected.append(model.predict(user, 100 + item))
+        else:
+            expected.append(model.global_mean)
+    assert model.predict_batch(users, items) == pytest.approx(expected)
+
+
+# ------------------------------------------ Batches ------------------------------------------------
+
+@pytest.fixture
+def engine_models(monkeypatch):
+    """The engine's globals set to a tiny SVD model, content index and metadata over the same movies."""
+    imdb_ids = [1000 + index for index in range(30)]
+    movie_names = pd.DataFrame({'imdb_id': [formating_imdbId(imdb_id) for imdb_id in imdb_ids],
+                                'title': [f'Movie {index}' for index in range(30)], 'year': 2000})
+    translation = IdTranslation.from_dicts({str(imdb_id): 100 + index for index, imdb_id in enumerate(imdb_ids)},
+                                           {100 + index: float(imdb_id) for index, imdb_id in enumerate(imdb_ids)})
+    content_ids = IdTranslation.from_dicts({str(imdb_id): index for index, imdb_id in enumerate(imdb_ids)},
+                                           {index: float(imdb_id) for index, imdb_id in enumerate(imdb_ids)})
+    monkeypatch.setattr(engine, 'movie_metadata', MovieMetadata(movie_names))
+    monkeypatch.setattr(engine, 'matrix_ids', translation)
+    monkeypatch.setattr(engine, 'recommender', svd_model())
+    monkeypatch.setattr(engine, 'content_ids', content_ids)
+    monkeypatch.setattr(engine, 'content_index', EmbeddingIndex(np.random.default_rng(8).normal(size=(30, 6))))
+    return movie_names['imdb_id'].tolist()
+
+
+@pytest.mark.parametrize('algorithm, params', [
+    (AlgorithmType.SVD, {'fixedReturns': 4}),
+    (AlgorithmType.SVD, {'fixedReturns': 4, 'foldIn': 'regularized'}),
+    (AlgorithmType.CONTENT_BASED, {'fixedReturns': 4, 'minSimilarity': 0.01}),
+])
+def test_batch_matches_single_requests(engine_models, algorithm, params):
+    rng = np.random.default_rng(9)
+    users = [[Rating(imdb_id=imdb_id, rating=float(rng.integers(1, 11)) / 2)
+              for imdb_id in rng.choice(engine_models, size=size, replace=False)] for size in (1, 3, 6, 10)]
+    # A malformed id, an unknown movie and no ratings at all fail that user only
+    users[1:1] = [[Rating(imdb_id='bad', rating=4)], [Rating(imdb_id='tt9999999', rating=4)], []]
+
+    statuses = list(engine.run_batch(algorithm, users, params))
+    assert len(statuses) == len(users)
+    for ratings, status in zip(users, statuses):
+        try:
+            expected = JobStatus(status='completed', results=engine.run_algorithm(algorithm, ratings, params))
+        except Exception as e:
+            expected = JobStatus(status='failed', error=str(e))
+        assert status.status == expected.status
+        assert status.results == expected.results
+
+
+# ------------------------------------------ Stores ------------------------------------------------
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_job_store_evicts_least_recently_updated_and_expires_finished(monkeypatch, tmp_path, backend):
+    monkeypatch.setattr(JobStore, '_backend', None)
+    monkeypatch.setattr(JobStore, 'max_jobs', 3)
+    monkeypatch.setattr(JobStore, 'ttl_seconds', 0.2)
+    JobStore.configure(backend=backend, path=str(tmp_path / 'jobs.sqlite3'))
+    results = [MovieRecommendation(id='tt0111161', title='The Shawshank Redemption', year=1994)]
+
+    async def run():
+        for job_id in 'abc':
+            await JobStore.create_job(job_id)
+        await JobStore.update_job('a', JobStatus(status='running'))
+        await JobStore.create_job('d')
+        # 'b' is the least recently updated
+        assert await JobStore.get_job('b') is None
+        assert (await JobStore.get_job('a')).status == 'running'
+
+        await JobStore.update_job('c', JobStatus(status='completed', results=results))
+        await JobStore.update_job('c', JobStatus(status='late progress'))
+        assert await JobStore.get_job('c') == JobStatus(status='completed', results=results)
+
+        await asyncio.sleep(0.3)
+        assert await JobStore.get_job('c') is None
+        assert await JobStore.sweep() == 1
+        stats = await JobStore.stats()
+        assert (stats['jobs'], stats['active_jobs'], stats['finished_jobs']) == (2, 2, 0)
+
+        if backend == 'memory':
+            # In memory a read counts as a use too; sqlite only orders by the last update
+            await JobStore.get_job('a')
+            await JobStore.create_job('e')
+            await JobStore.create_job('f')
+            assert await JobStore.get_job('d') is None
+            assert await JobStore.get_job('a') is not None
+
+    asyncio.run(run())
+
+
+def test_result_cache_matches_lru_dict(monkeypatch):
+    monkeypatch.setattr(ResultCache, '_entries', OrderedDict())
+    monkeypatch.setattr(ResultCache, 'max_entries', 3)
+    reference = OrderedDict()
+
+    rng = np.random.default_rng(10)
+    for key in rng.integers(0, 6, size=60).astype(str).tolist():
+        results = [MovieRecommendation(id=f'tt{key:0>7}', title=key)]
+        expected = reference.get(key)
+        if expected is not None:
+            reference.move_to_end(key)
+        assert ResultCache.get(key) == expected
+        if expected is None:
+            ResultCache.put(key, results)
+            reference[key] = results
+            while len(reference) > 3:
+                reference.popitem(last=False)
+    assert list(ResultCache._entries) == list(reference)
+
+    monkeypatch.setattr(ResultCache, 'ttl_seconds', 0)
+    assert ResultCache.get(next(iter(reference))) is None
+
+
+def test_request_key_ignores_rating_order_and_default_params():
+    ratings = [Rating(imdb_id='tt0111161', rating=5), Rating(imdb_id='tt0068646', rating=4.5)]
+    defaults = engine.normalize_params(AlgorithmType.KNN_ITEM, None)
+    explicit = engine.normalize_params(AlgorithmType.KNN_ITEM, {'k': 100, 'fixedReturns': 5, 'unrelated': 1})
+    assert request_key(ratings, AlgorithmType.KNN_ITEM, defaults) == \
+        request_key(ratings[::-1], AlgorithmType.KNN_ITEM, explicit)
+    assert request_key(ratings, AlgorithmType.KNN_ITEM, defaults) != \
+        request_key(ratings, AlgorithmType.SVD, engine.normalize_params(AlgorithmType.SVD, None))
+
+
+def test_columnar_table_round_trips_the_csv(tmp_path):
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame({
+        'sparse_user_id': rng.integers(0, 1000, 50),
+        'rating': rng.integers(1, 11, 50) / 2,
+        'score': rng.normal(size=50),
+        'title': [f'Title {index}, "quoted"' if index % 7 else None for index in range(50)],
+        'flag': rng.random(50) > 0.5,
+    }, index=pd.RangeIndex(50) * 3)
+    df.to_csv(tmp_path / 'table.csv')
+    expected = pd.read_csv(tmp_path / 'table.csv', index_col=0)
+
+    save_table(expected, str(tmp_path / 'table'))
+    loaded = load_table(str(tmp_path / 'table'))
+    # Integers and floats come back narrowed to 32 bits when no value changes
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False, check_index_type=False)
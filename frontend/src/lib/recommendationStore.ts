@@ -105,6 +105,7 @@ export async function enrichRecommendationStore(movieIds: string[]): Promise<Mov
 function createRecommendationStore() {
   const { subscribe, set } = writable<Movie[]>([]);
   let pollInterval: number | null = null;
+  let eventSource: EventSource | null = null;
 
   return {
     subscribe,
@@ -121,46 +122,76 @@ function createRecommendationStore() {
         // Start the job
         const { jobId } = await startRecommendationJob(ratings, algorithm, params);
         
-        // Poll for results
+        // Stream status updates, fall back to polling if the stream fails
         return new Promise((resolve, reject) => {
-          pollInterval = window.setInterval(async () => {
-            try {
-              const status = await checkJobStatus(jobId);
-              console.log(status.status)
-              jobStatus.set(status.status);
-              if (status.status === 'completed') {
-                clearInterval(pollInterval!);
-                // Create an array to store all movies
-                const recommendedMovies: Movie[] = status.results.map(res => ({
-                    id: res.id,
-                    title: res.title,
-                    rating: 0,
-                    genre: '',
-                    year: res.year,
-                    poster: null,
-                    plot: '',
-                    imdbRating: 0,
-                    tmdbId: 0
-                }));
-
-                // Set all movies at once
-                set(recommendedMovies);
-                resolve(recommendedMovies);
-              } else if (status.status === 'failed') {
+          const onStatus = (status: JobStatus): boolean => {
+            console.log(status.status)
+            jobStatus.set(status.status);
+            if (status.status === 'completed') {
+              // Create an array to store all movies
+              const recommendedMovies: Movie[] = status.results!.map(res => ({
+                  id: res.id,
+                  title: res.title,
+                  rating: 0,
+                  genre: '',
+                  year: res.year,
+                  poster: null,
+                  plot: '',
+                  imdbRating: 0,
+                  tmdbId: 0
+              }));
+
+              // Set all movies at once
+              set(recommendedMovies);
+              resolve(recommendedMovies);
+              return true;
+            } else if (status.status === 'failed') {
+              reject(new Error(status.error || 'Job failed'));
+              return true;
+            }
+            // Keep waiting if status is 'pending' or a progress message
+            return false;
+          };
+
+          const poll = () => {
+            pollInterval = window.setInterval(async () => {
+              try {
+                const status = await checkJobStatus(jobId);
+                if (onStatus(status)) clearInterval(pollInterval!);
+              } catch (error) {
                 clearInterval(pollInterval!);
-                reject(new Error(status.error || 'Job failed'));
+                reject(error);
               }
-              // Continue polling if status is 'pending'
-            } catch (error) {
-              clearInterval(pollInterval!);
-              reject(error);
-            }
-          }, 1000); // Poll every second
-          
-          // Stop polling after 30 seconds
+            }, 1000); // Poll every second
+          };
+
+          if (typeof EventSource === 'undefined') {
+            poll();
+          } else {
+            let finished = false;
+            eventSource = new EventSource(`${LOCAL_URL}/api/recommendations/stream/${jobId}`);
+            eventSource.onmessage = (event) => {
+              finished = onStatus(JSON.parse(event.data));
+              if (finished) {
+                eventSource!.close();
+                eventSource = null;
+              }
+            };
+            eventSource.onerror = () => {
+              // The server closes the stream after the final status; a stream that
+              // fails before it (proxy, older server, dropped connection) switches to polling
+              eventSource?.close();
+              eventSource = null;
+              if (!finished) poll();
+            };
+          }
+
+          // Stop waiting after 120 seconds
           setTimeout(() => {
-            if (pollInterval) {
-              clearInterval(pollInterval);
+            if (pollInterval || eventSource) {
+              if (pollInterval) clearInterval(pollInterval);
+              eventSource?.close();
+              eventSource = null;
               reject(new Error('Recommendation timeout'));
             }
           }, 120000);
@@ -172,6 +203,7 @@ function createRecommendationStore() {
     },
     cleanup: () => {
       if (pollInterval) clearInterval(pollInterval);
+      eventSource?.close();
     }
   };
 }